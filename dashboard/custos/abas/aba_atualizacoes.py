@@ -4,7 +4,7 @@ from datetime import datetime
 from pathlib import Path
 
 from utils.custos.atualizar_pesos import atualizar_pesos_em_precificacao, calcular_pesos_por_estado
-from utils.utils_filtros import filtrar_vendas_json_por_periodo, quantidade_vendida_por_sku, buscar_valor_por_prefixo
+from utils.utils_filtros import filtrar_cubo_por_periodo, quantidade_vendida_por_sku, buscar_valor_por_prefixo
 from utils.precificacao.meli.atualizar_peso_quantidade import calcular_peso_quantidade, atualizar_json_com_peso_quantidade
 from utils.precificacao.margem_pond_venda_e_quant import atualizar_margens_ponderadas
 from utils.utils_datas import obter_data_inicio_fim_mes, obter_lista_meses_existentes, selecionar_mes_competencia
@@ -43,8 +43,8 @@ def render_aba_atualizacoes():
         pesos_mg, _ = calcular_pesos_por_estado(CAMINHO_VENDAS_MG, data_inicio, data_fim, "MG")
 
         # Quantidade vendida e valor vendido por SKU
-        df_sp_vendas = filtrar_vendas_json_por_periodo(str(CAMINHO_VENDAS_SP), data_inicio, data_fim)
-        df_mg_vendas = filtrar_vendas_json_por_periodo(str(CAMINHO_VENDAS_MG), data_inicio, data_fim)
+        df_sp_vendas = filtrar_cubo_por_periodo(str(CAMINHO_VENDAS_SP), data_inicio, data_fim)
+        df_mg_vendas = filtrar_cubo_por_periodo(str(CAMINHO_VENDAS_MG), data_inicio, data_fim)
 
         qtd_sp = quantidade_vendida_por_sku(df_sp_vendas)
         qtd_mg = quantidade_vendida_por_sku(df_mg_vendas)
@@ -5,7 +5,7 @@ from pathlib import Path
 
 from utils.utils_custos import carregar_custos, obter_mes, atualizar_custo_mes
 from utils.publicidade.metricas import calcular_metricas_publicidade
-from utils.utils_filtros import filtrar_vendas_json_por_periodo
+from utils.utils_filtros import filtrar_cubo_por_periodo
 from utils.utils_datas import obter_lista_meses_existentes, selecionar_mes_competencia
 
 ADS_SP_PATH = Path("C:/Users/dmdel/OneDrive/Aplicativos/tokens/publicidade/ads_mes_sp.json")
@@ -79,8 +79,8 @@ def render_aba_publicidade():
     data_inicio_mg = pd.to_datetime(df_mg['desde'], errors='coerce').min().date() if 'desde' in df_mg else None
     data_fim_mg = pd.to_datetime(df_mg['ate'], errors='coerce').max().date() if 'ate' in df_mg else None
 
-    df_vendas_sp = filtrar_vendas_json_por_periodo(str(VENDAS_SP), data_inicio_sp, data_fim_sp, unidade="SP") if data_inicio_sp and data_fim_sp else pd.DataFrame()
-    df_vendas_mg = filtrar_vendas_json_por_periodo(str(VENDAS_MG), data_inicio_mg, data_fim_mg, unidade="MG") if data_inicio_mg and data_fim_mg else pd.DataFrame()
+    df_vendas_sp = filtrar_cubo_por_periodo(str(VENDAS_SP), data_inicio_sp, data_fim_sp, unidade="SP") if data_inicio_sp and data_fim_sp else pd.DataFrame()
+    df_vendas_mg = filtrar_cubo_por_periodo(str(VENDAS_MG), data_inicio_mg, data_fim_mg, unidade="MG") if data_inicio_mg and data_fim_mg else pd.DataFrame()
 
     st.markdown("---")
     if data_inicio_sp and data_fim_sp:
@@ -3,7 +3,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from utils.utils_filtros import filtrar_vendas_json_por_periodo
+from utils.utils_filtros import filtrar_cubo_por_periodo
 
 # Caminhos
 BASE = Path(os.getenv("BASE_PATH", "C:/Users/dmdel/OneDrive/Aplicativos"))
@@ -38,8 +38,8 @@ def render_consolidado_financeiro():
     st.caption(f"📅 Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}")
 
     # Filtra vendas por período
-    df_sp = filtrar_vendas_json_por_periodo(str(VENDAS_SP_JSON), start_date, end_date, unidade="SP")
-    df_mg = filtrar_vendas_json_por_periodo(str(VENDAS_MG_JSON), start_date, end_date, unidade="MG")
+    df_sp = filtrar_cubo_por_periodo(str(VENDAS_SP_JSON), start_date, end_date, unidade="SP")
+    df_mg = filtrar_cubo_por_periodo(str(VENDAS_MG_JSON), start_date, end_date, unidade="MG")
     receita_sp = df_sp["Valor total"].sum()
     receita_mg = df_mg["Valor total"].sum()
 
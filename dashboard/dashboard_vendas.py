@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import math
 from datetime import datetime, timedelta
-from utils.utils_filtros import filtrar_vendas_json_por_periodo
+from utils.utils_filtros import filtrar_cubo_por_periodo, concatenar_vendas
 
 def gerar_previsao_30d(dff):
     hoje = datetime.now().date()
@@ -11,10 +11,10 @@ def gerar_previsao_30d(dff):
 
     dff["Data da venda"] = pd.to_datetime(dff["Data da venda"], errors="coerce").dt.date
 
-    df_15 = dff[dff["Data da venda"] >= start_15d].groupby(["Unidade", "Produto"], as_index=False).agg({"Quantidade": "sum"})
+    df_15 = dff[dff["Data da venda"] >= start_15d].groupby(["Unidade", "Produto"], as_index=False, observed=True).agg({"Quantidade": "sum"})
     df_15.rename(columns={"Quantidade": "Qtd 15d"}, inplace=True)
 
-    df_7 = dff[dff["Data da venda"] >= start_7d].groupby(["Unidade", "Produto"], as_index=False).agg({"Quantidade": "sum"})
+    df_7 = dff[dff["Data da venda"] >= start_7d].groupby(["Unidade", "Produto"], as_index=False, observed=True).agg({"Quantidade": "sum"})
     df_7.rename(columns={"Quantidade": "Qtd 7d"}, inplace=True)
 
     prev = pd.merge(df_15, df_7, on=["Unidade", "Produto"], how="outer").fillna(0)
@@ -31,9 +31,9 @@ def render_dashboard(titulo, json_sp=None, json_mg=None):
     data_inicio = col1.date_input("🗕️ Data inicial", value=hoje - timedelta(days=30), key="data_ini")
     data_fim = col2.date_input("🗕️ Data final", value=hoje, key="data_fim")
 
-    df_sp = filtrar_vendas_json_por_periodo(json_sp, data_inicio, data_fim, unidade="SP") if json_sp else pd.DataFrame()
-    df_mg = filtrar_vendas_json_por_periodo(json_mg, data_inicio, data_fim, unidade="MG") if json_mg else pd.DataFrame()
-    df = pd.concat([df_sp, df_mg], ignore_index=True)
+    df_sp = filtrar_cubo_por_periodo(json_sp, data_inicio, data_fim, unidade="SP") if json_sp else pd.DataFrame()
+    df_mg = filtrar_cubo_por_periodo(json_mg, data_inicio, data_fim, unidade="MG") if json_mg else pd.DataFrame()
+    df = concatenar_vendas([df_sp, df_mg])
 
     if df.empty:
         st.warning("❌ Nenhum dado encontrado no período selecionado.")
@@ -60,7 +60,7 @@ def render_dashboard(titulo, json_sp=None, json_mg=None):
 
     st.subheader("📦 Resumo de vendas")
     resumo = (
-        dff.groupby(["Unidade", "Produto"], as_index=False)
+        dff.groupby(["Unidade", "Produto"], as_index=False, observed=True)
         .agg({"Quantidade": "sum", "Valor total": "sum"})
         .sort_values("Valor total", ascending=False)
     )
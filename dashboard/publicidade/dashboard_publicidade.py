@@ -7,7 +7,7 @@ from dashboard.publicidade.secoes_publicidade import (
 )
 from utils.publicidade.metricas import calcular_metricas_publicidade
 from dashboard.publicidade.config_publicidade import REGION_CONFIG, DESIGNER_PATH, PUBLICIDADE_PATH
-from utils.utils_filtros import filtrar_vendas_json_por_periodo
+from utils.utils_filtros import filtrar_vendas_json_por_periodo, filtrar_cubo_por_periodo
 from utils.utils_publicidade import carregar_ads_json
 import pandas as pd
 import streamlit as st
@@ -54,7 +54,8 @@ def render_publicidade(region_key: str):
     ads30 = filtrar(df_ads30)
 
     # Filtro por período com base nas datas reais dos anúncios
-    vendas7 = filtrar_vendas_json_por_periodo(
+    # (7 e 15 dias só entram no TACoS: somas vindas do cubo diário)
+    vendas7 = filtrar_cubo_por_periodo(
     caminho_json=str(DESIGNER_PATH / cfg["vendas"]),
     data_inicio=ads7["desde"].min().date(),
     data_fim=ads7["ate"].max().date(),
@@ -62,7 +63,7 @@ def render_publicidade(region_key: str):
 )
     vendas7 = vendas7[vendas7["codigo_do_anuncio"].isin(ads7["codigo_do_anuncio"])]
 
-    vendas15 = filtrar_vendas_json_por_periodo(
+    vendas15 = filtrar_cubo_por_periodo(
     caminho_json=str(DESIGNER_PATH / cfg["vendas"]),
     data_inicio=ads15["desde"].min().date(),
     data_fim=ads15["ate"].max().date(),
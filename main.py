@@ -1,58 +1,32 @@
-import time
-from dotenv import load_dotenv
-from ml_client import load_config, save_orders_incremental
-
 import sys
-import time
-
-def atualizar_sp():
-    # ... seu código existente ...
-    pass
+from dotenv import load_dotenv
 
-def atualizar_mg():
-    # ... seu código existente ...
-    pass
+# Carrega variáveis de ambiente do .env local antes dos imports: ml_scheduler, ml_sync,
+# ml_http, ml_ratelimit e order_store leem a configuração ao serem importados
+# (Render injeta ENV direto em produção)
+load_dotenv()
 
-def main_loop():
-    while True:
-        atualizar_sp()
-        atualizar_mg()
-        time.sleep(3600)
+from ml_scheduler import LOJAS, job_loja, executar_jobs, run_daemon
 
-def main_once():
-    atualizar_sp()
-    atualizar_mg()
-
-if __name__ == "__main__":
-    if "--once" in sys.argv:
-        main_once()
-    else:
-        main_loop()
 
 def job():
     """
-    Executa a atualização de pedidos para MG e SP.
+    Executa a atualização de pedidos para MG e SP uma vez (lojas em paralelo).
+    Lojas com sincronização em andamento em outro processo são puladas.
     """
-    for loja in ["MG", "SP"]:
-        cfg = load_config(loja)
-        print(f"[INFO] Atualizando pedidos de {loja}...")
-        try:
-            novos = save_orders_incremental(loja, int(cfg["seller_id"]), cfg["json_path"])
-            if novos:
-                print(f"[INFO] {novos} novos pedidos adicionados para {loja}.")
-            else:
-                print(f"[INFO] Nenhum novo pedido para {loja}.")
-        except Exception as e:
-            print(f"[ERROR] Falha ao atualizar {loja}: {e}")
+    for loja, novos in executar_jobs([job_loja(loja) for loja in LOJAS]).items():
+        if isinstance(novos, Exception):
+            print(f"[ERROR] Falha ao atualizar {loja}: {novos}")
+        elif novos:
+            print(f"[INFO] {novos} pedidos novos/atualizados para {loja}.")
+        else:
+            print(f"[INFO] Nenhum novo pedido para {loja}.")
 
 
 if __name__ == "__main__":
-    # Carrega variáveis de ambiente do .env local (Render injeta ENV direto em produção)
-    load_dotenv()
-
-    print("[INFO] Iniciando serviço de atualização de pedidos...")
-    # Loop infinito, executa job a cada hora
-    while True:
+    if "--once" in sys.argv:
         job()
-        print("[INFO] Aguardando 1 hora até próxima execução...")
-        time.sleep(3600)  # 3600 segundos = 1 hora
+    else:
+        print("[INFO] Iniciando serviço de atualização de pedidos...")
+        # Uma cadência por loja, com jitter e lock contra execuções sobrepostas (ml_scheduler)
+        run_daemon()
@@ -1,31 +1,77 @@
-import requests
-from ml_client import get_valid_token, load_config
+import os
+import json
+import time
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ml_client import get_valid_token, token_dir, cache_dir, write_json_atomic
+from ml_http import get_client
+from ml_items import listar_ids_anuncios
 
 API_VERSION = "1"
+# Validade do advertiser_id salvo em disco
+ADVERTISER_TTL_SECONDS = int(os.getenv("ADVERTISER_TTL_DIAS", "7")) * 86400
+# Consultas simultâneas na descoberta do advertiser
+ADVERTISER_WORKERS = int(os.getenv("ADVERTISER_WORKERS", "8"))
+# Relatórios de campanha buscados simultaneamente
+REPORT_WORKERS = int(os.getenv("ADS_REPORT_WORKERS", "8"))
+METRICAS_SOMAVEIS = ("impressions", "clicks", "cost", "conversions")
+ADS_HEADERS = {
+    "Content-Type": "application/json",
+    "Api-Version": API_VERSION
+}
 
 # ========== FUNÇÕES PRINCIPAIS ==========
 
 def listar_anuncios(store: str):
     """
-    Lista todos os anúncios ativos da conta (store: MG ou SP).
+    Lista todos os anúncios ativos da conta (store: MG ou SP), com paginação completa.
     """
-    cfg = load_config(store)
-    token = get_valid_token(store)
-    seller_id = cfg["seller_id"]
+    return listar_ids_anuncios(store, status="active")
 
-    url = f"https://api.mercadolibre.com/users/{seller_id}/items/search?status=active"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
-    resp.raise_for_status()
 
-    results = resp.json().get("results", [])
-    return results
+def _ler_advertiser_cache(store: str):
+    """
+    Retorna o advertiser_id salvo para a loja, se ainda estiver dentro do TTL.
+    """
+    path = token_dir / f"advertiser_{store}.json"
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        cache = json.load(f)
+    if time.time() - cache.get("_obtained_at", 0) > ADVERTISER_TTL_SECONDS:
+        return None
+    return cache.get("advertiser_id")
 
 
-def encontrar_advertiser(store: str):
+def _probar_advertiser(product_id: str, token: str, encontrado: threading.Event):
     """
-    Faz um loop entre todos os anúncios ativos e tenta encontrar um advertiser_id válido.
+    Consulta o advertiser de um anúncio. Não faz a requisição se outro worker já achou.
     """
+    if encontrado.is_set():
+        return None
+    url = f"/advertising/advertisers?product_id={product_id}"
+    resp = get_client().get(url, token=token, headers=ADS_HEADERS)
+    if resp.status_code == 200:
+        advertisers = resp.json().get("advertisers", [])
+        if advertisers:
+            return advertisers[0]["id"]
+    else:
+        print(f"[X] {product_id} não possui Ads ({resp.status_code})")
+    return None
+
+
+def encontrar_advertiser(store: str, usar_cache: bool = True):
+    """
+    Encontra um advertiser_id válido para a loja.
+    Usa o valor salvo em tokens/advertiser_<store>.json enquanto estiver no TTL;
+    senão consulta os anúncios ativos em paralelo e para no primeiro que responder.
+    """
+    if usar_cache:
+        advertiser_id = _ler_advertiser_cache(store)
+        if advertiser_id:
+            return advertiser_id
+
     anuncios = listar_anuncios(store)
     if not anuncios:
         print(f"[INFO] Nenhum anúncio ativo encontrado para {store}.")
@@ -33,25 +79,32 @@ def encontrar_advertiser(store: str):
 
     print(f"[INFO] {len(anuncios)} anúncios ativos encontrados para {store}. Tentando localizar advertiser...")
     token = get_valid_token(store)
+    encontrado = threading.Event()
+
+    advertiser_id = None
+    pool = ThreadPoolExecutor(max_workers=ADVERTISER_WORKERS)
+    try:
+        futuros = {pool.submit(_probar_advertiser, pid, token, encontrado): pid for pid in anuncios}
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            if resultado:
+                encontrado.set()
+                advertiser_id = resultado
+                print(f"[OK] Advertiser encontrado para {futuros[futuro]}: {advertiser_id}")
+                break
+    finally:
+        # Cancela as consultas que ainda não começaram
+        pool.shutdown(wait=True, cancel_futures=True)
 
-    for product_id in anuncios:
-        url = f"https://api.mercadolibre.com/advertising/advertisers?product_id={product_id}"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-            "Api-Version": API_VERSION
-        }
-        resp = requests.get(url, headers=headers)
-        if resp.status_code == 200:
-            advertisers = resp.json().get("advertisers", [])
-            if advertisers:
-                print(f"[OK] Advertiser encontrado para {product_id}: {advertisers[0]['id']}")
-                return advertisers[0]['id']
-        else:
-            print(f"[X] {product_id} não possui Ads ({resp.status_code})")
-
-    print(f"[ERRO] Nenhum advertiser encontrado para {store}.")
-    return None
+    if not advertiser_id:
+        print(f"[ERRO] Nenhum advertiser encontrado para {store}.")
+        return None
+
+    write_json_atomic(token_dir / f"advertiser_{store}.json", {
+        "advertiser_id": advertiser_id,
+        "_obtained_at": int(time.time()),
+    })
+    return advertiser_id
 
 
 def listar_campanhas(store: str, advertiser_id: str):
@@ -59,13 +112,8 @@ def listar_campanhas(store: str, advertiser_id: str):
     Lista todas as campanhas vinculadas a um advertiser_id.
     """
     token = get_valid_token(store)
-    url = f"https://api.mercadolibre.com/advertising/campaigns?advertiser_id={advertiser_id}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-        "Api-Version": API_VERSION
-    }
-    resp = requests.get(url, headers=headers)
+    url = f"/advertising/campaigns?advertiser_id={advertiser_id}"
+    resp = get_client().get(url, token=token, headers=ADS_HEADERS)
     resp.raise_for_status()
     return resp.json()
 
@@ -75,22 +123,92 @@ def relatorio_campanha(store: str, campaign_id: str, date_from: str, date_to: st
     Obtém relatório de métricas (impressões, cliques, custo, ROAS) para uma campanha.
     """
     token = get_valid_token(store)
-    url = f"https://api.mercadolibre.com/advertising/campaigns/{campaign_id}/reports"
+    url = f"/advertising/campaigns/{campaign_id}/reports"
     params = {
         "date_from": date_from,
         "date_to": date_to,
         "metrics": "impressions,clicks,cost,conversions,roas"
     }
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-        "Api-Version": API_VERSION
-    }
-    resp = requests.get(url, headers=headers, params=params)
+    resp = get_client().get(url, token=token, headers=ADS_HEADERS, params=params)
     resp.raise_for_status()
     return resp.json()
 
 
+def _dias(date_from: str, date_to: str) -> list:
+    inicio, fim = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    return [(inicio + timedelta(days=i)).isoformat() for i in range((fim - inicio).days + 1)]
+
+
+def _somar_metricas(diarios: list) -> dict:
+    """
+    Soma as métricas diárias. O ROAS não é somável: é recalculado ponderando pelo custo
+    (receita do dia = roas * custo).
+    """
+    total = {m: sum(d.get(m, 0) or 0 for d in diarios) for m in METRICAS_SOMAVEIS}
+    receita = sum((d.get("roas", 0) or 0) * (d.get("cost", 0) or 0) for d in diarios)
+    total["roas"] = round(receita / total["cost"], 2) if total["cost"] else 0
+    return total
+
+
+def coletar_metricas_campanhas(store: str, campanhas: list, date_from: str, date_to: str) -> dict:
+    """
+    Coleta as métricas de todas as campanhas no período, em paralelo.
+    O período é dividido em dias; dias já encerrados ficam em cache em
+    cache/ads/<store>/<campanha>.json e só são buscados uma vez.
+    O dia corrente (ainda aberto) é sempre buscado de novo.
+    Um dia que falha é registrado e fica fora da soma (e do cache, sendo buscado de
+    novo na próxima coleta); os demais são gravados normalmente.
+    Retorna {campaign_id: métricas somadas no período}.
+    """
+    hoje = date.today().isoformat()
+    dias = _dias(date_from, date_to)
+    ads_dir = cache_dir / "ads" / store
+    ads_dir.mkdir(parents=True, exist_ok=True)
+
+    caches = {}
+    pendentes = []
+    for camp_id in campanhas:
+        path = ads_dir / f"{camp_id}.json"
+        cache = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                cache = json.load(f)
+        caches[camp_id] = cache
+        pendentes += [(camp_id, dia) for dia in dias if dia >= hoje or dia not in cache]
+
+    print(f"[INFO] {store}: {len(pendentes)} relatórios diários a buscar "
+          f"({len(campanhas) * len(dias) - len(pendentes)} em cache).")
+
+    with ThreadPoolExecutor(max_workers=REPORT_WORKERS) as pool:
+        futuros = {pool.submit(relatorio_campanha, store, camp_id, dia, dia): (camp_id, dia)
+                   for camp_id, dia in pendentes}
+        falhas = 0
+        for futuro in as_completed(futuros):
+            camp_id, dia = futuros[futuro]
+            try:
+                caches[camp_id][dia] = futuro.result()
+            except Exception as e:
+                falhas += 1
+                print(f"[WARN] {store}: relatório da campanha {camp_id} em {dia} falhou: {e}")
+    if falhas:
+        print(f"[WARN] {store}: {falhas} relatórios diários com erro ficaram fora do total.")
+
+    resultado = {}
+    for camp_id, cache in caches.items():
+        # Só dias encerrados vão para o disco. Outro processo pode ter gravado dias do
+        # mesmo cache enquanto buscávamos: mescla com o arquivo atual antes de gravar
+        path = ads_dir / f"{camp_id}.json"
+        try:
+            with open(path, encoding="utf-8") as f:
+                no_disco = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            no_disco = {}
+        fechados = {**no_disco, **{dia: rel for dia, rel in cache.items() if dia < hoje}}
+        write_json_atomic(path, fechados)
+        resultado[camp_id] = _somar_metricas([cache[dia] for dia in dias if dia in cache])
+    return resultado
+
+
 def exibir_resumo_ads(store: str, date_from="2025-07-01", date_to="2025-07-20"):
     """
     Busca advertiser_id automaticamente e exibe resumo das campanhas da conta.
@@ -106,11 +224,14 @@ def exibir_resumo_ads(store: str, date_from="2025-07-01", date_to="2025-07-20"):
         print(f"[INFO] Nenhuma campanha ativa para {store}.")
         return
 
+    metricas = coletar_metricas_campanhas(
+        store, [camp.get("id") for camp in campanhas["campaigns"]], date_from, date_to
+    )
     for camp in campanhas.get("campaigns", []):
         camp_id = camp.get("id")
         camp_name = camp.get("name")
         print(f"\n=== Campanha: {camp_name} (ID: {camp_id}) ===")
-        rel = relatorio_campanha(store, camp_id, date_from, date_to)
+        rel = metricas[camp_id]
         print(f" - Impressões: {rel.get('impressions', 0)}")
         print(f" - Cliques: {rel.get('clicks', 0)}")
         print(f" - Custo: R$ {rel.get('cost', 0)/100:.2f}")  # API retorna centavos
@@ -1,14 +1,21 @@
 import os
 import json
 import time
-import requests
+import tempfile
+import threading
 from pathlib import Path
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from ml_http import get_client
 
 # Diretórios para tokens e último update
 token_dir = Path("tokens")
 token_dir.mkdir(exist_ok=True)
 LAST_UPDATE_FILE = token_dir / "last_update.json"
+# Caches de dados da API (catálogo, relatórios): fora de tokens/, que guarda credenciais
+cache_dir = Path(os.getenv("ML_CACHE_DIR", "cache"))
+cache_dir.mkdir(exist_ok=True)
 
 
 # ---------------- CONFIGURAÇÕES ----------------
@@ -28,11 +35,100 @@ def load_config(loja: str) -> dict:
     }
 
 
+# ---------------- LOCK ENTRE PROCESSOS ----------------
+LOCK_STALE_SECONDS = 120
+
+
+@contextmanager
+def file_lock(path, timeout: float = 60, stale: float = LOCK_STALE_SECONDS):
+    """
+    Lock exclusivo entre processos baseado na criação atômica de <path>.lock.
+    Locks abandonados (processo morto) expiram após 'stale' segundos. Enquanto o
+    lock está em uso, uma thread renova o mtime do arquivo, então operações mais
+    longas que 'stale' (ex.: compactação do store) não têm o lock quebrado.
+    Com timeout=0 funciona como tentativa única (TimeoutError se ocupado).
+    """
+    lock_path = Path(f"{path}.lock")
+    inicio = time.time()
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > stale:
+                    lock_path.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() - inicio > timeout:
+                raise TimeoutError(f"Timeout aguardando lock {lock_path}")
+            time.sleep(0.1)
+    parar = threading.Event()
+    renovacao = threading.Thread(target=_renovar_lock, args=(lock_path, parar, max(stale / 4, 1.0)), daemon=True)
+    renovacao.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        renovacao.join()
+        try:
+            lock_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _renovar_lock(lock_path: Path, parar: threading.Event, intervalo: float):
+    while not parar.wait(intervalo):
+        try:
+            os.utime(lock_path)
+        except FileNotFoundError:
+            return
+
+
+def write_json_atomic(path, data):
+    """
+    Grava JSON em arquivo temporário e substitui o destino de uma vez,
+    para que leitores nunca vejam um arquivo pela metade.
+    O temporário tem nome único no mesmo diretório: escritores simultâneos
+    (várias sessões do Streamlit) não sobrescrevem o temporário um do outro.
+    """
+    path = Path(path)
+    f = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(f.name, path)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+
+
 # ---------------- TOKEN ----------------
-def get_valid_token(store: str) -> str:
+TOKEN_MARGIN_SECONDS = 60
+
+# Cache em memória do processo: loja -> dict do token
+_token_cache = {}
+_token_locks = {}
+_token_locks_guard = threading.Lock()
+
+
+def _token_lock(store: str) -> threading.Lock:
+    with _token_locks_guard:
+        return _token_locks.setdefault(store, threading.Lock())
+
+
+def _token_expired(token: dict) -> bool:
+    return time.time() > token.get("_obtained_at", 0) + token.get("expires_in", 0) - TOKEN_MARGIN_SECONDS
+
+
+def _load_token(store: str) -> dict:
     """
-    Retorna um token válido para a loja, fazendo refresh se necessário.
-    Se não existir arquivo, tenta carregar de ENV var <STORE>_TOKEN_JSON.
+    Lê o token do arquivo da loja; se não existir, carrega de ENV var <STORE>_TOKEN_JSON.
     """
     path = token_dir / f"{store}.json"
 
@@ -51,20 +147,47 @@ def get_valid_token(store: str) -> str:
         if "_obtained_at" not in token:
             token["_obtained_at"] = int(time.time())
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(token, f, ensure_ascii=False, indent=2)
-    else:
-        token = json.load(open(path, encoding="utf-8"))
+        write_json_atomic(path, token)
+        return token
+
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
 
-    if time.time() > token.get("_obtained_at", 0) + token.get("expires_in", 0) - 60:
-        token = refresh_token(store)
+
+def get_valid_token(store: str) -> str:
+    """
+    Retorna um token válido para a loja, fazendo refresh se necessário.
+    Se não existir arquivo, tenta carregar de ENV var <STORE>_TOKEN_JSON.
+    O token fica em memória até pouco antes de expirar; o refresh é single-flight
+    (um único POST por processo) e protegido por lock de arquivo entre processos.
+    """
+    token = _token_cache.get(store)
+    if token and not _token_expired(token):
+        return token["access_token"]
+
+    with _token_lock(store):
+        # Outra thread pode ter renovado enquanto esperávamos o lock
+        token = _token_cache.get(store)
+        if token and not _token_expired(token):
+            return token["access_token"]
+
+        token = _load_token(store)
+        if _token_expired(token):
+            with file_lock(token_dir / f"{store}.json"):
+                # Outro processo pode ter renovado antes de obtermos o lock
+                token = _load_token(store)
+                if _token_expired(token):
+                    token = refresh_token(store)
+
+        _token_cache[store] = token
     return token["access_token"]
 
 
 def refresh_token(store: str) -> dict:
     cfg = load_config(store)
     token_path = token_dir / f"{store}.json"
-    token = json.load(open(token_path, encoding="utf-8"))
+    with open(token_path, encoding="utf-8") as f:
+        token = json.load(f)
 
     payload = {
         "grant_type":    "refresh_token",
@@ -72,129 +195,238 @@ def refresh_token(store: str) -> dict:
         "client_secret": cfg["client_secret"],
         "refresh_token": token["refresh_token"],
     }
-    resp = requests.post("https://api.mercadolibre.com/oauth/token", data=payload)
+    resp = get_client().post("/oauth/token", data=payload)
     resp.raise_for_status()
 
     token_data = resp.json()
     token_data["_obtained_at"] = int(time.time())
-    with open(token_path, "w", encoding="utf-8") as f:
-        json.dump(token_data, f, ensure_ascii=False, indent=2)
+    write_json_atomic(token_path, token_data)
+    _token_cache[store] = token_data
 
     return token_data
 
 
 # ---------------- ORDERS ----------------
-def fetch_all_orders(store: str, seller_id: int, status="paid") -> list:
+ORDERS_URL = "/orders/search"
+PAGE_SIZE = 50
+# /orders/search não devolve resultados além deste offset; janelas maiores são divididas
+OFFSET_MAX = int(os.getenv("ML_ORDERS_OFFSET_MAX", "10000"))
+# Janela mínima: abaixo disso não divide mais (evita recursão infinita)
+JANELA_MINIMA = timedelta(minutes=1)
+
+
+def _buscar_pagina_orders(token: str, params: dict, offset: int) -> dict:
+    """
+    Busca uma única página de /orders/search no offset informado.
     """
-    Busca TODAS as vendas de uma loja (paginando até o fim).
+    resp = get_client().get(ORDERS_URL, token=token, params={**params, "offset": offset})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def fetch_all_orders(store: str, seller_id: int, status="paid", workers: int = 1) -> list:
+    """
+    Busca TODAS as vendas de uma loja, em ordem cronológica.
+    Até OFFSET_MAX pedidos, pagina por offset; com workers > 1, lê paging.total da
+    primeira página e busca os offsets restantes em paralelo. Acima do teto de offset,
+    busca o histórico por janelas de data (fetch_orders_incremental divide ao meio
+    até cada janela caber).
     """
     token = get_valid_token(store)
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.mercadolibre.com/orders/search"
 
     params = {
         "seller": seller_id,
         "status": status,
-        "limit": 50,
+        "limit": PAGE_SIZE,
         "offset": 0,
         "sort": "date_asc"  # ordem cronológica
     }
 
+    primeira = _buscar_pagina_orders(token, params, 0)
+    total = primeira.get("paging", {}).get("total", 0)
+    if total > OFFSET_MAX:
+        return _fetch_all_orders_por_janelas(store, seller_id, status, primeira, total)
+
+    if workers > 1:
+        return _fetch_all_orders_paralelo(store, token, params, workers, primeira, total)
+
     all_orders = []
-    total = 0
+    data = primeira
     while True:
-        resp = requests.get(url, headers=headers, params=params)
-        resp.raise_for_status()
-        data = resp.json()
         batch = data.get("results", [])
         if not batch:
             break
         all_orders.extend(batch)
-        total += len(batch)
-        print(f"[INFO] {store}: {total} pedidos coletados...")
-        params["offset"] += 50
-        if len(batch) < 50:
+        print(f"[INFO] {store}: {len(all_orders)} pedidos coletados...")
+        params["offset"] += PAGE_SIZE
+        if len(batch) < PAGE_SIZE or params["offset"] >= min(total, OFFSET_MAX):
             break
+        data = _buscar_pagina_orders(token, params, params["offset"])
+
+    return all_orders
+
+
+def _fetch_all_orders_paralelo(store: str, token: str, params: dict, workers: int,
+                               primeira: dict, total: int) -> list:
+    """
+    Paginação por offset em paralelo, guiada por paging.total da primeira resposta.
+    """
+    all_orders = list(primeira.get("results", []))
+    print(f"[INFO] {store}: {total} pedidos a coletar com {workers} workers...")
+
+    offsets = range(PAGE_SIZE, min(total, OFFSET_MAX), PAGE_SIZE)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map preserva a ordem dos offsets, independente de qual página termina antes
+        for data in pool.map(lambda off: _buscar_pagina_orders(token, params, off), offsets):
+            all_orders.extend(data.get("results", []))
+            print(f"[INFO] {store}: {len(all_orders)} pedidos coletados...")
 
     return all_orders
 
 
-def save_all_orders(store: str, seller_id: int, path: str) -> int:
+def _fetch_all_orders_por_janelas(store: str, seller_id: int, status, primeira: dict, total: int) -> list:
+    """
+    Histórico acima do teto de offset: busca de date_created do pedido mais antigo
+    até agora, com a janela dividida ao meio até cada parte caber em OFFSET_MAX.
+    """
+    inicio = primeira["results"][0]["date_created"]
+    fim = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    print(f"[INFO] {store}: {total} pedidos, acima do limite de offset ({OFFSET_MAX}); "
+          f"buscando por janelas de data.")
+    pedidos = fetch_orders_incremental(store, seller_id, inicio, fim, status=status)
+    # As janelas vêm em ordem decrescente: volta para a ordem cronológica
+    pedidos.sort(key=lambda p: _parse_iso(p["date_created"]))
+    print(f"[INFO] {store}: {len(pedidos)} pedidos coletados.")
+    return pedidos
+
+
+def save_all_orders(store: str, seller_id: int, path: str, workers: int = 1) -> int:
     """
-    Busca todas as vendas e salva em um único JSON (sobrescrevendo o arquivo).
+    Busca todas as vendas e substitui o conteúdo do store de pedidos da loja.
     """
-    todos = fetch_all_orders(store, seller_id)
+    from order_store import OrderStore
+
+    todos = fetch_all_orders(store, seller_id, workers=workers)
     if not todos:
         print(f"[INFO] Nenhum pedido encontrado para {store}.")
         return 0
 
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(todos, f, ensure_ascii=False, indent=2)
+    order_store = OrderStore(path)
+    order_store.rewrite(todos)
 
-    print(f"[INFO] {len(todos)} pedidos salvos em {path}")
+    print(f"[INFO] {len(todos)} pedidos salvos em {order_store.dir}")
     return len(todos)
 
 
 # ---------------- INCREMENTAL (MANTIDO) ----------------
-def fetch_orders_incremental(store: str, seller_id: int, start_date=None, end_date=None, status="paid") -> list:
+def params_incremental(seller_id: int, start_date=None, end_date=None, status="paid",
+                       date_field="date_created") -> dict:
     """
-    Busca pedidos no intervalo definido.
+    Monta os parâmetros de /orders/search para a busca incremental.
+    date_field define o campo filtrado pelo intervalo: "date_created" ou "last_updated".
+    status=None busca pedidos em qualquer status (ex.: cancelados depois da venda).
     """
-    token = get_valid_token(store)
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.mercadolibre.com/orders/search"
-
     params = {
         "seller": seller_id,
-        "status": status,
-        "limit": 50,
+        "limit": PAGE_SIZE,
         "offset": 0,
         "sort": "date_desc"
     }
+    if status:
+        params["status"] = status
 
     if start_date and end_date:
-        params["order.date_created.from"] = start_date
-        params["order.date_created.to"] = end_date
+        params[f"order.{date_field}.from"] = start_date
+        params[f"order.{date_field}.to"] = end_date
+    return params
+
+
+def _parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def split_window(start_date: str, end_date: str):
+    """
+    Divide o intervalo [start_date, end_date] ao meio.
+    Os filtros de data do /orders/search incluem as duas pontas e as datas dos pedidos
+    têm precisão de milissegundos: a primeira metade vai até o instante do meio e a
+    segunda começa 1 ms depois, sem deixar pedidos entre as duas.
+    Retorna None se a janela já for menor que JANELA_MINIMA.
+    """
+    inicio, fim = _parse_iso(start_date), _parse_iso(end_date)
+    if fim - inicio < JANELA_MINIMA:
+        return None
+    meio = inicio + (fim - inicio) / 2
+    meio = meio.replace(microsecond=meio.microsecond // 1000 * 1000)
+    return (
+        (start_date, meio.isoformat(timespec="milliseconds")),
+        ((meio + timedelta(milliseconds=1)).isoformat(timespec="milliseconds"), end_date),
+    )
+
+
+def precisa_dividir(store: str, total: int, start_date, end_date):
+    """
+    Se a janela passa do teto de offset, retorna as duas metades para buscar.
+    Sem intervalo de datas não há como dividir: avisa que pedidos podem faltar.
+    """
+    if total <= OFFSET_MAX:
+        return None
+    metades = split_window(start_date, end_date) if start_date and end_date else None
+    if metades is None:
+        print(f"[WARN] {store}: {total} pedidos na janela, acima do limite de offset "
+              f"({OFFSET_MAX}); pedidos além do limite não serão retornados.")
+        return None
+    print(f"[INFO] {store}: {total} pedidos em {start_date} → {end_date}; dividindo a janela.")
+    return metades
+
+
+def fetch_orders_incremental(store: str, seller_id: int, start_date=None, end_date=None, status="paid",
+                             date_field="date_created") -> list:
+    """
+    Busca pedidos no intervalo definido.
+    Janelas com paging.total acima de OFFSET_MAX são divididas recursivamente
+    ao meio e as metades buscadas em paralelo.
+    """
+    token = get_valid_token(store)
+    params = params_incremental(seller_id, start_date, end_date, status, date_field)
+
+    data = _buscar_pagina_orders(token, params, 0)
+    total = data.get("paging", {}).get("total", 0)
+
+    metades = precisa_dividir(store, total, start_date, end_date)
+    if metades:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            partes = pool.map(
+                lambda janela: fetch_orders_incremental(store, seller_id, *janela, status=status,
+                                                        date_field=date_field),
+                metades,
+            )
+            return [pedido for parte in partes for pedido in parte]
 
     all_orders = []
     while True:
-        resp = requests.get(url, headers=headers, params=params)
-        resp.raise_for_status()
-        data = resp.json()
         batch = data.get("results", [])
         if not batch:
             break
         all_orders.extend(batch)
-        params["offset"] += 50
-        if len(batch) < 50:
+        params["offset"] += PAGE_SIZE
+        if len(batch) < PAGE_SIZE or params["offset"] >= min(total, OFFSET_MAX):
             break
+        data = _buscar_pagina_orders(token, params, params["offset"])
 
     return all_orders
 
 
 def save_orders_incremental(store: str, seller_id: int, path: str, start_date=None, end_date=None) -> int:
     """
-    Salva pedidos incrementais no arquivo JSON.
+    Salva pedidos incrementais no store de pedidos da loja (ver order_store).
+    Wrapper síncrono sobre o motor assíncrono de ml_sync (uma única loja).
     """
-    novos = fetch_orders_incremental(store, seller_id, start_date, end_date)
-    if not novos:
-        print(f"[INFO] Nenhum pedido novo para {store}.")
-        return 0
-
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            existentes = json.load(f)
-    except FileNotFoundError:
-        existentes = []
-
-    ids_existentes = {p["id"] for p in existentes}
-    filtrados = [p for p in novos if p["id"] not in ids_existentes]
-    atualizados = existentes + filtrados
-
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(atualizados, f, ensure_ascii=False, indent=2)
-
-    print(f"[INFO] {len(filtrados)} novos pedidos adicionados para {store}.")
-    return len(filtrados)
+    from ml_sync import sync_stores
+
+    job = {"store": store, "seller_id": seller_id, "path": path,
+           "start_date": start_date, "end_date": end_date}
+    resultado = sync_stores([job])[store]
+    if isinstance(resultado, Exception):
+        raise resultado
+    return resultado
@@ -0,0 +1,121 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from ml_ratelimit import executar, get_scheduler
+
+# ---------------- CONFIGURAÇÕES ----------------
+API_BASE = os.getenv("ML_API_BASE", "https://api.mercadolibre.com").rstrip("/")
+DEFAULT_TIMEOUT = float(os.getenv("ML_HTTP_TIMEOUT", "30"))
+POOL_SIZE = int(os.getenv("ML_HTTP_POOL_SIZE", "20"))
+USE_HTTP2 = os.getenv("ML_HTTP2", "0") == "1"
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "User-Agent": "meli-sync/1.0",
+}
+
+
+# ---------------- CLIENTE HTTP ----------------
+class MLHttpClient:
+    """
+    Cliente HTTP compartilhado para a API do Mercado Livre.
+    Mantém conexões keep-alive em pool, timeout padrão e headers de autenticação.
+    Com http2=True (ou ML_HTTP2=1) usa httpx com HTTP/2, se o pacote 'h2' estiver instalado.
+    Todas as requisições passam pelo agendador de ml_ratelimit (taxa adaptativa e
+    retry de 429/5xx); só GETs são repetidos automaticamente.
+    """
+
+    def __init__(self, base_url: str = API_BASE, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = POOL_SIZE, http2: bool = USE_HTTP2):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.http2 = False
+        self.scheduler = get_scheduler()
+
+        if http2:
+            try:
+                import httpx
+                self._session = httpx.Client(
+                    http2=True,
+                    timeout=timeout,
+                    headers=DEFAULT_HEADERS,
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                )
+                self.http2 = True
+                return
+            except ImportError:
+                print("[WARN] HTTP/2 indisponível (instale httpx[http2]); usando requests.")
+
+        self._session = requests.Session()
+        self._session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def url(self, path: str) -> str:
+        """Aceita caminho relativo ('/orders/search') ou URL absoluta."""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, token: str = None, headers: dict = None, **kwargs):
+        hdrs = dict(headers or {})
+        if token:
+            hdrs["Authorization"] = f"Bearer {token}"
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        return executar(
+            lambda: self._session.request(method, url, headers=hdrs, **kwargs),
+            scheduler=self.scheduler,
+            retentar=method.upper() == "GET",
+        )
+
+    def get(self, path: str, token: str = None, headers: dict = None, **kwargs):
+        return self.request("GET", path, token=token, headers=headers, **kwargs)
+
+    def post(self, path: str, token: str = None, headers: dict = None, **kwargs):
+        return self.request("POST", path, token=token, headers=headers, **kwargs)
+
+    def close(self):
+        self._session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MLHttpClient:
+    """
+    Retorna o cliente HTTP único do processo (criado na primeira chamada).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MLHttpClient()
+    return _client
+
+
+def criar_cliente_async(pool_size: int = POOL_SIZE):
+    """
+    Cria um httpx.AsyncClient com as mesmas configurações do cliente síncrono.
+    Deve ser usado como 'async with' dentro de um único event loop.
+    """
+    import httpx
+
+    http2 = USE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("[WARN] HTTP/2 indisponível (instale httpx[http2]); usando HTTP/1.1.")
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=API_BASE,
+        http2=http2,
+        timeout=DEFAULT_TIMEOUT,
+        headers=DEFAULT_HEADERS,
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
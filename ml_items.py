@@ -0,0 +1,132 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ml_client import get_valid_token, load_config, cache_dir, write_json_atomic
+from ml_http import get_client
+
+# ---------------- CONFIGURAÇÕES ----------------
+SEARCH_PAGE_SIZE = 100
+# Acima deste total a busca por offset não é aceita: usa search_type=scan
+SEARCH_OFFSET_MAX = 1000
+# Máximo de ids por chamada do multi-get /items
+MULTIGET_SIZE = 20
+ITEMS_WORKERS = int(os.getenv("ITEMS_WORKERS", "8"))
+ITEM_ATTRIBUTES = "id,title,price,available_quantity,status,seller_custom_field,attributes"
+
+
+# ---------------- LISTAGEM ----------------
+def _buscar_ids(token: str, seller_id: str, params: dict) -> dict:
+    resp = get_client().get(f"/users/{seller_id}/items/search", token=token, params=params)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def listar_ids_anuncios(store: str, status: str = "active") -> list:
+    """
+    Lista TODOS os ids de anúncios da conta.
+    Até SEARCH_OFFSET_MAX usa paginação por offset em paralelo (guiada por paging.total);
+    acima disso usa search_type=scan, que pagina por scroll_id.
+    """
+    cfg = load_config(store)
+    token = get_valid_token(store)
+    seller_id = cfg["seller_id"]
+    base = {"limit": SEARCH_PAGE_SIZE}
+    if status:
+        base["status"] = status
+
+    primeira = _buscar_ids(token, seller_id, {**base, "offset": 0})
+    ids = list(primeira.get("results", []))
+    total = primeira.get("paging", {}).get("total", len(ids))
+
+    if total <= SEARCH_OFFSET_MAX:
+        offsets = range(SEARCH_PAGE_SIZE, total, SEARCH_PAGE_SIZE)
+        with ThreadPoolExecutor(max_workers=ITEMS_WORKERS) as pool:
+            for data in pool.map(lambda off: _buscar_ids(token, seller_id, {**base, "offset": off}), offsets):
+                ids.extend(data.get("results", []))
+        return ids
+
+    # Catálogo grande: scan sequencial (cada página depende do scroll_id anterior)
+    ids = []
+    vistos = set()
+    params = {**base, "search_type": "scan"}
+    while True:
+        data = _buscar_ids(token, seller_id, params)
+        batch = [i for i in data.get("results", []) if i not in vistos]
+        # Página sem ids novos: o scan recomeçou ou não avança (evita laço infinito)
+        if not batch:
+            break
+        ids.extend(batch)
+        vistos.update(batch)
+        scroll_id = data.get("scroll_id")
+        if not scroll_id:
+            break
+        params["scroll_id"] = scroll_id
+    return ids
+
+
+# ---------------- DETALHES (MULTI-GET) ----------------
+def _extrair_sku(item: dict) -> str:
+    if item.get("seller_custom_field"):
+        return item["seller_custom_field"]
+    for attr in item.get("attributes") or []:
+        if attr.get("id") == "SELLER_SKU":
+            return attr.get("value_name") or ""
+    return ""
+
+
+def _buscar_detalhes(token: str, ids: list) -> list:
+    """Uma chamada de /items com até MULTIGET_SIZE ids."""
+    resp = get_client().get(
+        "/items",
+        token=token,
+        params={"ids": ",".join(ids), "attributes": ITEM_ATTRIBUTES},
+    )
+    resp.raise_for_status()
+    itens = []
+    for entrada in resp.json():
+        if entrada.get("code") != 200:
+            print(f"[WARN] Item {entrada.get('body', {}).get('id')} retornou {entrada.get('code')}")
+            continue
+        body = entrada["body"]
+        itens.append({
+            "id": body.get("id"),
+            "title": body.get("title"),
+            "sku": _extrair_sku(body),
+            "price": body.get("price"),
+            "available_quantity": body.get("available_quantity"),
+            "status": body.get("status"),
+        })
+    return itens
+
+
+def buscar_detalhes_itens(store: str, ids: list) -> list:
+    """
+    Busca título, SKU, preço e estoque de cada anúncio via multi-get /items,
+    em lotes de MULTIGET_SIZE ids executados em paralelo.
+    """
+    token = get_valid_token(store)
+    lotes = [ids[i:i + MULTIGET_SIZE] for i in range(0, len(ids), MULTIGET_SIZE)]
+    with ThreadPoolExecutor(max_workers=ITEMS_WORKERS) as pool:
+        return [item for lote in pool.map(lambda l: _buscar_detalhes(token, l), lotes) for item in lote]
+
+
+# ---------------- CATÁLOGO LOCAL ----------------
+def catalogo_path(store: str):
+    return cache_dir / f"catalogo_{store}.json"
+
+
+def sincronizar_catalogo(store: str, status: str = "active") -> list:
+    """
+    Sincroniza o catálogo local da loja (cache/catalogo_<store>.json) com
+    todos os anúncios e seus detalhes.
+    """
+    ids = listar_ids_anuncios(store, status)
+    print(f"[INFO] {store}: {len(ids)} anúncios encontrados; buscando detalhes...")
+    catalogo = buscar_detalhes_itens(store, ids)
+    write_json_atomic(catalogo_path(store), catalogo)
+    print(f"[INFO] {store}: catálogo com {len(catalogo)} anúncios salvo em {catalogo_path(store)}")
+    return catalogo
+
+
+if __name__ == "__main__":
+    sincronizar_catalogo("MG")
+    sincronizar_catalogo("SP")
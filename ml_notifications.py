@@ -0,0 +1,263 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+
+# Carrega variáveis de ambiente do .env local antes das configurações e dos imports
+# abaixo, que leem o ENV ao serem importados (Render injeta ENV direto em produção)
+load_dotenv()
+
+from ml_client import load_config, get_valid_token, _parse_iso
+from ml_http import criar_cliente_async
+from ml_ratelimit import executar_async
+from ml_scheduler import executar_jobs
+from order_store import OrderStore
+
+# ---------------- CONFIGURAÇÕES ----------------
+LOJAS = ["MG", "SP"]
+TOPICO = "orders_v2"
+# Espera sem novas notificações antes de buscar o lote (agrupa rajadas de mudanças)
+DEBOUNCE_SEGUNDOS = float(os.getenv("ML_NOTIF_DEBOUNCE", "5"))
+# Espera máxima desde a primeira notificação pendente, mesmo com notificações contínuas
+ESPERA_MAXIMA = float(os.getenv("ML_NOTIF_MAX_WAIT", "30"))
+LOTE_MAXIMO = int(os.getenv("ML_NOTIF_BATCH", "50"))
+CONCORRENCIA = int(os.getenv("ML_NOTIF_CONCURRENCY", "4"))
+# Polling completo (por last_updated) mantido como reconciliação de baixa frequência.
+# Com o receptor no ar ele substitui o daemon de main.py (cadência padrão de 60 min,
+# pensada para quem não tem URL pública de callback): não rode os dois.
+RECONCILIACAO_HORAS = float(os.getenv("ML_RECONCILIACAO_HORAS", "6"))
+# Quantos pedidos buscados recentemente são lembrados para descartar notificações repetidas
+HISTORICO_BUSCAS = 10000
+
+
+def _data_envio(payload: dict) -> datetime:
+    """
+    Horário de envio da notificação ('sent'). Ausente ou fora do formato esperado,
+    usa o horário de recebimento: a notificação nunca pode falhar com 500, senão o
+    Mercado Livre continua reenviando.
+    """
+    try:
+        enviado = _parse_iso(payload["sent"])
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return datetime.now(timezone.utc)
+    return enviado if enviado.tzinfo else enviado.replace(tzinfo=timezone.utc)
+
+
+def _order_id(resource: str):
+    """Extrai o id do pedido de resources como '/orders/2000001234'."""
+    ultimo = (resource or "").rstrip("/").rsplit("/", 1)[-1]
+    return int(ultimo) if ultimo.isdigit() else None
+
+
+class FilaNotificacoes:
+    """
+    Pedidos notificados e ainda não buscados de uma loja.
+    - Duplicatas de um pedido pendente viram uma única busca.
+    - Notificações enviadas antes da última busca do pedido são descartadas
+      (a versão gravada já reflete aquela mudança).
+    - O lote fica pronto após DEBOUNCE_SEGUNDOS sem novidades, ESPERA_MAXIMA
+      desde a primeira pendência ou ao atingir LOTE_MAXIMO pedidos.
+    """
+
+    def __init__(self):
+        self.pendentes = set()
+        self.buscados = OrderedDict()
+        self.primeira = None
+        self.ultima = None
+
+    def registrar(self, order_id: int, enviado: datetime = None) -> bool:
+        buscado_em = self.buscados.get(order_id)
+        if enviado and buscado_em and enviado <= buscado_em:
+            return False
+        agora = time.monotonic()
+        self.ultima = agora
+        if not self.pendentes:
+            self.primeira = agora
+        if order_id in self.pendentes:
+            return False
+        self.pendentes.add(order_id)
+        return True
+
+    def pronta(self) -> bool:
+        if not self.pendentes:
+            return False
+        agora = time.monotonic()
+        return (len(self.pendentes) >= LOTE_MAXIMO
+                or agora - self.ultima >= DEBOUNCE_SEGUNDOS
+                or agora - self.primeira >= ESPERA_MAXIMA)
+
+    def retirar(self) -> list:
+        ids = sorted(self.pendentes)[:LOTE_MAXIMO]
+        self.pendentes.difference_update(ids)
+        if self.pendentes:
+            # O que sobrou do lote sai no próximo ciclo
+            self.primeira = self.ultima = time.monotonic() - ESPERA_MAXIMA
+        return ids
+
+    def devolver(self, ids: list):
+        """Recoloca ids de um lote que falhou para nova tentativa."""
+        if not self.pendentes:
+            self.primeira = time.monotonic()
+        self.ultima = time.monotonic()
+        self.pendentes.update(ids)
+
+    def marcar_buscados(self, ids: list, quando: datetime):
+        for order_id in ids:
+            self.buscados[order_id] = quando
+            self.buscados.move_to_end(order_id)
+        while len(self.buscados) > HISTORICO_BUSCAS:
+            self.buscados.popitem(last=False)
+
+
+class OrderNotificationReceiver:
+    """
+    Recebe notificações orders_v2 do Mercado Livre e grava no store somente
+    os pedidos referenciados, em lotes. O lote agrupa a gravação (um segmento
+    por lote) e as duplicatas, não as requisições: a API de pedidos não tem
+    multiget, então cada pedido ainda é um GET /orders/{id}, com até
+    CONCORRENCIA em paralelo. A reconciliação periódica por last_updated
+    (ml_sync) cobre notificações perdidas.
+    """
+
+    def __init__(self, jobs: list):
+        self.jobs = jobs
+        self.lojas_por_seller = {int(job["seller_id"]): job for job in jobs}
+        self.filas = {job["store"]: FilaNotificacoes() for job in jobs}
+        self.stats = {"recebidas": 0, "enfileiradas": 0, "ignoradas": 0, "buscadas": 0, "lotes": 0}
+
+    def receber(self, payload: dict) -> str:
+        """Registra uma notificação. Precisa responder rápido: nenhuma chamada à API aqui."""
+        self.stats["recebidas"] += 1
+        if not isinstance(payload, dict):
+            self.stats["ignoradas"] += 1
+            return "ignorada"
+        try:
+            job = self.lojas_por_seller.get(int(payload.get("user_id") or 0))
+        except (TypeError, ValueError):
+            job = None
+        order_id = _order_id(payload.get("resource"))
+        if payload.get("topic") != TOPICO or job is None or order_id is None:
+            self.stats["ignoradas"] += 1
+            return "ignorada"
+
+        if not self.filas[job["store"]].registrar(order_id, _data_envio(payload)):
+            self.stats["ignoradas"] += 1
+            return "duplicada"
+        self.stats["enfileiradas"] += 1
+        return "enfileirada"
+
+    async def _buscar_pedido(self, client, token: str, order_id: int, sem: asyncio.Semaphore):
+        async with sem:
+            resp = await executar_async(lambda: client.get(
+                f"/orders/{order_id}", headers={"Authorization": f"Bearer {token}"}
+            ))
+        if resp.status_code == 404:
+            print(f"[WARN] Pedido {order_id} notificado não encontrado.")
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+    async def descarregar(self, client, job: dict):
+        """Busca um lote de pedidos notificados da loja e grava como um único segmento."""
+        fila = self.filas[job["store"]]
+        ids = fila.retirar()
+        inicio = datetime.now(timezone.utc)
+        try:
+            token = await asyncio.to_thread(get_valid_token, job["store"])
+            # Um GET /orders/{id} por pedido (não há busca de vários ids numa chamada)
+            sem = asyncio.Semaphore(CONCORRENCIA)
+            pedidos = await asyncio.gather(*[self._buscar_pedido(client, token, oid, sem) for oid in ids])
+            pedidos = [p for p in pedidos if p]
+            await asyncio.to_thread(OrderStore(job["path"]).append, pedidos)
+        except Exception as e:
+            print(f"[ERROR] Falha ao buscar lote de {job['store']} ({len(ids)} pedidos): {e}")
+            fila.devolver(ids)
+            return
+        fila.marcar_buscados(ids, inicio)
+        self.stats["buscadas"] += len(pedidos)
+        self.stats["lotes"] += 1
+        print(f"[INFO] {job['store']}: {len(pedidos)} pedidos notificados gravados no store.")
+
+    async def processar(self, intervalo: float = 0.5):
+        """Laço que descarrega as filas prontas."""
+        async with criar_cliente_async(pool_size=CONCORRENCIA * len(self.jobs)) as client:
+            while True:
+                prontas = [job for job in self.jobs if self.filas[job["store"]].pronta()]
+                if prontas:
+                    await asyncio.gather(*[self.descarregar(client, job) for job in prontas])
+                else:
+                    await asyncio.sleep(intervalo)
+
+    async def reconciliar(self):
+        """
+        Polling de baixa frequência por last_updated, como rede de segurança.
+        Passa pelo lock de execução de ml_scheduler: uma loja já sincronizando
+        no daemon ou em update_once é pulada nesta rodada.
+        """
+        while True:
+            await asyncio.sleep(RECONCILIACAO_HORAS * 3600)
+            print("[INFO] Reconciliação periódica por last_updated...")
+            jobs = [{**job, "mode": "last_updated"} for job in self.jobs]
+            resultados = await asyncio.to_thread(executar_jobs, jobs, "notificacoes")
+            for loja, res in resultados.items():
+                if isinstance(res, Exception):
+                    print(f"[ERROR] Reconciliação de {loja} falhou: {res}")
+
+    def resumo(self) -> dict:
+        return {**self.stats, "pendentes": {loja: len(f.pendentes) for loja, f in self.filas.items()}}
+
+
+def jobs_padrao() -> list:
+    jobs = []
+    for loja in LOJAS:
+        cfg = load_config(loja)
+        jobs.append({"store": loja, "seller_id": int(cfg["seller_id"]), "path": cfg["json_path"]})
+    return jobs
+
+
+def criar_app(jobs: list = None) -> FastAPI:
+    """
+    App FastAPI do receptor. Configure a URL de callback do aplicativo no
+    Mercado Livre para POST /notifications com o tópico orders_v2.
+    """
+    estado = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        receptor = OrderNotificationReceiver(jobs or jobs_padrao())
+        estado["receptor"] = receptor
+        tarefas = [asyncio.create_task(receptor.processar()), asyncio.create_task(receptor.reconciliar())]
+        yield
+        for tarefa in tarefas:
+            tarefa.cancel()
+
+    app = FastAPI(title="Receptor de notificações Mercado Livre", lifespan=lifespan)
+
+    @app.post("/notifications")
+    async def notifications(request: Request):
+        # O Mercado Livre espera 200 rapidamente; a busca acontece em segundo plano.
+        # Corpo ilegível também recebe 200 (ignorada): um 500 faria o ML reenviar
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        return {"status": estado["receptor"].receber(payload)}
+
+    @app.get("/health")
+    async def health():
+        return estado["receptor"].resumo()
+
+    return app
+
+
+if __name__ == "__main__":
+    porta = int(os.getenv("PORT", "8000"))
+    print(f"[INFO] Receptor de notificações em 0.0.0.0:{porta}/notifications "
+          f"(reconciliação a cada {RECONCILIACAO_HORAS:g}h)")
+    uvicorn.run(criar_app(), host="0.0.0.0", port=porta, log_level="warning")
@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+# ---------------- CONFIGURAÇÕES ----------------
+TAXA_INICIAL = float(os.getenv("ML_RATE_INICIAL", "10"))        # req/s
+TAXA_MIN = float(os.getenv("ML_RATE_MIN", "0.5"))
+TAXA_MAX = float(os.getenv("ML_RATE_MAX", "50"))
+CONCORRENCIA_INICIAL = int(os.getenv("ML_CONCORRENCIA_INICIAL", "4"))
+CONCORRENCIA_MAX = int(os.getenv("ML_CONCORRENCIA_MAX", "32"))
+MAX_TENTATIVAS = int(os.getenv("ML_MAX_TENTATIVAS", "6"))
+# Aumento aditivo por janela (≈ 1 RTT) sem congestionamento
+INCREMENTO_TAXA = float(os.getenv("ML_RATE_INCREMENTO", "1"))  # req/s
+JANELA_TAXA = 10.0  # segundos usados para medir a taxa atual
+
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+ERROS_TRANSPORTE = (requests.ConnectionError, requests.Timeout, httpx.TransportError)
+
+
+class ErroRetentavel(Exception):
+    """Resposta 429/5xx que deve ser repetida após o backoff."""
+
+    def __init__(self, resp, retry_after: float = None):
+        super().__init__(f"HTTP {resp.status_code}")
+        self.resp = resp
+        self.retry_after = retry_after
+
+
+def ler_retry_after(resp) -> float:
+    """
+    Interpreta o header Retry-After (segundos ou data HTTP). Retorna None se ausente.
+    """
+    valor = resp.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(valor).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------- AGENDADOR ----------------
+class RequestScheduler:
+    """
+    Controla o ritmo das requisições à API:
+    - token bucket limita a taxa (req/s);
+    - AIMD ajusta taxa e concorrência: aumento aditivo (+INCREMENTO_TAXA req/s e
+      +1 de concorrência) por janela sem erros e redução multiplicativa (metade)
+      por evento de congestionamento (429/5xx ou erro de transporte);
+    - uma janela termina quando volta uma requisição enviada depois do último
+      ajuste (≈ 1 RTT): respostas de requisições que já estavam em voo refletem o
+      mesmo evento e não reduzem de novo;
+    - Retry-After pausa todas as requisições até o horário indicado.
+    Seguro para threads e para uso dentro de um event loop.
+    """
+
+    def __init__(self, taxa: float = TAXA_INICIAL, taxa_min: float = TAXA_MIN, taxa_max: float = TAXA_MAX,
+                 concorrencia: int = CONCORRENCIA_INICIAL, concorrencia_max: int = CONCORRENCIA_MAX):
+        self._lock = threading.Lock()
+        self.taxa = taxa
+        self.taxa_min = taxa_min
+        self.taxa_max = taxa_max
+        self.concorrencia = float(concorrencia)
+        self.concorrencia_max = concorrencia_max
+        self._tokens = 1.0
+        self._ultimo = time.monotonic()
+        self._em_voo = 0
+        self._pausado_ate = 0.0
+        self._ultimo_ajuste = 0.0
+        self._historico = deque()
+
+    def _reservar(self) -> float:
+        """Tenta ocupar uma vaga. Retorna 0 se conseguiu, senão quantos segundos esperar."""
+        with self._lock:
+            agora = time.monotonic()
+            if agora < self._pausado_ate:
+                return self._pausado_ate - agora
+
+            burst = max(self.concorrencia, 1.0)
+            self._tokens = min(burst, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+
+            if self._em_voo >= int(self.concorrencia):
+                return 0.05
+            if self._tokens < 1.0:
+                return (1.0 - self._tokens) / self.taxa
+
+            self._tokens -= 1.0
+            self._em_voo += 1
+            self._historico.append(agora)
+            return 0.0
+
+    def adquirir(self) -> float:
+        """Espera uma vaga; retorna o instante de envio (passe para liberar)."""
+        while True:
+            espera = self._reservar()
+            if espera == 0.0:
+                return time.monotonic()
+            time.sleep(espera)
+
+    async def adquirir_async(self) -> float:
+        while True:
+            espera = self._reservar()
+            if espera == 0.0:
+                return time.monotonic()
+            await asyncio.sleep(espera)
+
+    def liberar(self, status: int = None, retry_after: float = None, enviado: float = None,
+                falha_transporte: bool = False):
+        """
+        Libera a vaga e ajusta taxa/concorrência conforme o resultado.
+        enviado é o instante devolvido por adquirir; sem ele, todo resultado ajusta.
+        """
+        with self._lock:
+            self._em_voo -= 1
+            agora = time.monotonic()
+            nova_janela = enviado is None or enviado >= self._ultimo_ajuste
+            if status in STATUS_RETENTAVEIS or falha_transporte:
+                if retry_after:
+                    self._pausado_ate = max(self._pausado_ate, agora + retry_after)
+                if nova_janela:
+                    self.taxa = max(self.taxa_min, self.taxa * 0.5)
+                    self.concorrencia = max(1.0, self.concorrencia * 0.5)
+                    self._ultimo_ajuste = agora
+            elif status is not None and nova_janela:
+                self.taxa = min(self.taxa_max, self.taxa + INCREMENTO_TAXA)
+                self.concorrencia = min(self.concorrencia_max, self.concorrencia + 1.0)
+                self._ultimo_ajuste = agora
+
+    def taxa_atual(self) -> float:
+        """Requisições por segundo efetivamente enviadas na última janela."""
+        with self._lock:
+            limite = time.monotonic() - JANELA_TAXA
+            while self._historico and self._historico[0] < limite:
+                self._historico.popleft()
+            return len(self._historico) / JANELA_TAXA
+
+    def resumo(self) -> str:
+        return (f"taxa atual {self.taxa_atual():.1f} req/s, "
+                f"limite {self.taxa:.1f} req/s, concorrência {int(self.concorrencia)}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Retorna o agendador único do processo, compartilhado por todas as chamadas à API.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
+
+
+# ---------------- RETRY ----------------
+def _espera_backoff(retry_state) -> float:
+    """Usa o Retry-After quando informado; senão backoff exponencial com jitter."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, ErroRetentavel) and exc.retry_after is not None:
+        return exc.retry_after
+    return wait_random_exponential(multiplier=0.5, max=30)(retry_state)
+
+
+def _politica_retry() -> dict:
+    return {
+        "retry": retry_if_exception_type((ErroRetentavel,) + ERROS_TRANSPORTE),
+        "wait": _espera_backoff,
+        "stop": stop_after_attempt(MAX_TENTATIVAS),
+        "reraise": True,
+    }
+
+
+def _avaliar(scheduler: RequestScheduler, resp, enviado: float):
+    status = resp.status_code
+    retry_after = ler_retry_after(resp) if status in STATUS_RETENTAVEIS else None
+    scheduler.liberar(status, retry_after, enviado)
+    if status in STATUS_RETENTAVEIS:
+        print(f"[WARN] HTTP {status} da API; nova tentativa após backoff ({scheduler.resumo()}).")
+        raise ErroRetentavel(resp, retry_after)
+    return resp
+
+
+def executar(fn, scheduler: RequestScheduler = None, retentar: bool = True):
+    """
+    Executa fn() (que retorna uma resposta HTTP) sob o agendador.
+    429/5xx e erros de conexão são repetidos; esgotadas as tentativas,
+    a resposta final é devolvida para o chamador tratar (raise_for_status).
+    """
+    scheduler = scheduler or get_scheduler()
+
+    def tentativa():
+        enviado = scheduler.adquirir()
+        try:
+            resp = fn()
+        except BaseException as e:
+            # Timeout/conexão também indicam congestionamento
+            scheduler.liberar(enviado=enviado, falha_transporte=isinstance(e, ERROS_TRANSPORTE))
+            raise
+        return _avaliar(scheduler, resp, enviado)
+
+    if not retentar:
+        try:
+            return tentativa()
+        except ErroRetentavel as e:
+            return e.resp
+
+    try:
+        return Retrying(**_politica_retry())(tentativa)
+    except ErroRetentavel as e:
+        return e.resp
+
+
+async def executar_async(fn, scheduler: RequestScheduler = None):
+    """
+    Versão assíncrona de executar: fn() deve retornar um awaitable com a resposta.
+    """
+    scheduler = scheduler or get_scheduler()
+
+    async def tentativa():
+        enviado = await scheduler.adquirir_async()
+        try:
+            resp = await fn()
+        except BaseException as e:
+            # Timeout/conexão também indicam congestionamento
+            scheduler.liberar(enviado=enviado, falha_transporte=isinstance(e, ERROS_TRANSPORTE))
+            raise
+        return _avaliar(scheduler, resp, enviado)
+
+    try:
+        return await AsyncRetrying(**_politica_retry())(tentativa)
+    except ErroRetentavel as e:
+        return e.resp
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager, ExitStack
+from datetime import datetime, timezone
+
+from ml_client import load_config, file_lock, token_dir
+from ml_sync import sync_stores
+from order_store import OrderStore
+
+# ---------------- CONFIGURAÇÕES ----------------
+LOJAS = ["MG", "SP"]
+# Intervalo padrão entre sincronizações; por loja via <LOJA>_SYNC_INTERVAL_MIN.
+# Os 60 min valem para quem não recebe notificações (exigem URL pública de callback);
+# com o receptor ml_notifications no ar, a reconciliação dele substitui este daemon.
+INTERVALO_PADRAO_MIN = float(os.getenv("ML_SYNC_INTERVAL_MIN", "60"))
+# Atraso aleatório de até esta fração do intervalo em cada execução
+JITTER = float(os.getenv("ML_SYNC_JITTER", "0.1"))
+# Horários perdidos (execução longa, máquina suspensa):
+#   "coalesce" roda uma única vez assim que possível; "skip" espera o próximo horário
+CATCHUP = os.getenv("ML_SYNC_CATCHUP", "coalesce").lower()
+# Uma execução travada libera o lock da loja após este tempo
+RUN_LOCK_STALE = 6 * 3600
+RUNS_LOG = token_dir / "scheduler_runs.jsonl"
+
+
+def intervalo_loja(loja: str) -> float:
+    """Intervalo da loja em segundos."""
+    return float(os.getenv(f"{loja}_SYNC_INTERVAL_MIN", INTERVALO_PADRAO_MIN)) * 60
+
+
+def job_loja(loja: str) -> dict:
+    cfg = load_config(loja)
+    return {
+        "store": loja,
+        "seller_id": int(cfg["seller_id"]),
+        "path": cfg["json_path"],
+        "mode": "last_updated",
+    }
+
+
+# ---------------- LOCK DE EXECUÇÃO ----------------
+@contextmanager
+def lock_execucao(loja: str):
+    """
+    Tenta o lock de execução da loja, compartilhado entre processos (daemon,
+    botão Atualizar do Streamlit, execuções manuais). Entrega True se conseguiu
+    e False se já há uma sincronização da loja em andamento — sem esperar.
+    """
+    lock = file_lock(token_dir / f"sync_{loja}", timeout=0, stale=RUN_LOCK_STALE)
+    try:
+        lock.__enter__()
+    except TimeoutError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        lock.__exit__(None, None, None)
+
+
+# ---------------- MÉTRICAS ----------------
+def registrar_execucao(registro: dict):
+    """Acrescenta uma linha em tokens/scheduler_runs.jsonl."""
+    with file_lock(RUNS_LOG):
+        with open(RUNS_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def _registro(loja: str, origem: str, status: str, agendado: float = None, **campos) -> dict:
+    agora = time.time()
+    registro = {
+        "loja": loja,
+        "origem": origem,
+        "status": status,
+        "inicio": datetime.fromtimestamp(agora, timezone.utc).replace(microsecond=0).isoformat(),
+    }
+    if agendado is not None:
+        registro["atraso_s"] = round(agora - agendado, 1)
+    registro.update(campos)
+    return registro
+
+
+def executar_jobs(jobs: list, origem: str = "manual", agendado: float = None) -> dict:
+    """
+    Sincroniza os jobs cujas lojas não estão em execução em outro processo;
+    as demais são puladas. Cada loja gera um registro em RUNS_LOG com duração
+    e pedidos gravados. Retorna {loja: qtd|Exception} apenas das lojas executadas.
+    """
+    with ExitStack() as pilha:
+        livres = []
+        for job in jobs:
+            if pilha.enter_context(lock_execucao(job["store"])):
+                livres.append(job)
+            else:
+                print(f"[WARN] {job['store']}: sincronização já em andamento; execução ignorada.")
+                registrar_execucao(_registro(job["store"], origem, "ignorado", agendado))
+
+        if not livres:
+            return {}
+        registros = {job["store"]: _registro(job["store"], origem, "ok", agendado) for job in livres}
+        inicio = time.monotonic()
+        resultados = sync_stores(livres)
+        duracao = round(time.monotonic() - inicio, 2)
+
+    for job in livres:
+        registro = registros[job["store"]]
+        res = resultados[job["store"]]
+        if isinstance(res, Exception):
+            registro.update(status="erro", erro=str(res), duracao_s=duracao)
+        else:
+            ultimo = OrderStore(job["path"]).read_meta().get("last_run", {})
+            registro.update(
+                duracao_s=ultimo.get("duration_s", duracao),
+                pedidos_coletados=ultimo.get("fetched"),
+                pedidos_gravados=res,
+            )
+        registrar_execucao(registro)
+    return resultados
+
+
+# ---------------- DAEMON ----------------
+def _laco_loja(loja: str, parar: threading.Event):
+    """
+    Cadência independente da loja: uma execução lenta de uma loja não atrasa as outras.
+    Os horários base não acumulam deriva; o jitter só atrasa a execução.
+    """
+    intervalo = intervalo_loja(loja)
+    base = time.time()
+    print(f"[INFO] {loja}: sincronização a cada {intervalo / 60:g} min (jitter {JITTER:.0%}, catch-up {CATCHUP}).")
+    while not parar.is_set():
+        alvo = base + random.uniform(0, JITTER) * intervalo
+        if parar.wait(max(alvo - time.time(), 0)):
+            break
+        try:
+            job = job_loja(loja)
+            res = executar_jobs([job], origem="daemon", agendado=base).get(loja)
+            if isinstance(res, Exception):
+                print(f"[ERROR] Falha ao atualizar {loja}: {res}")
+        except Exception as e:
+            print(f"[ERROR] Execução agendada de {loja} falhou: {e}")
+
+        base += intervalo
+        agora = time.time()
+        if base < agora:
+            perdidos = int((agora - base) // intervalo) + 1
+            if CATCHUP == "skip":
+                base += perdidos * intervalo
+                print(f"[WARN] {loja}: {perdidos} horário(s) perdido(s) ignorado(s).")
+            else:
+                base = agora
+                print(f"[WARN] {loja}: atrasada; {perdidos} horário(s) agrupado(s) em uma execução.")
+
+
+def run_daemon(lojas: list = None):
+    """Inicia uma thread de agendamento por loja e aguarda até Ctrl+C."""
+    parar = threading.Event()
+    threads = [
+        threading.Thread(target=_laco_loja, args=(loja, parar), name=f"sync-{loja}")
+        for loja in (lojas or LOJAS)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("[INFO] Encerrando agendador (aguardando execuções em andamento)...")
+        parar.set()
+        for t in threads:
+            t.join()
@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from ml_client import (
+    get_valid_token, params_incremental, precisa_dividir, _parse_iso,
+    ORDERS_URL, PAGE_SIZE, OFFSET_MAX,
+)
+from ml_http import criar_cliente_async
+from ml_ratelimit import executar_async, get_scheduler
+from order_store import OrderStore
+
+# ---------------- CONFIGURAÇÕES ----------------
+# Limite de requisições simultâneas somando todas as lojas
+LIMITE_GLOBAL = int(os.getenv("ML_SYNC_MAX_CONCURRENCY", "8"))
+# Limite de requisições simultâneas por loja
+LIMITE_POR_LOJA = int(os.getenv("ML_SYNC_STORE_CONCURRENCY", "4"))
+# Sobreposição ao reler a partir da marca d'água (cobre relógios e atrasos de indexação)
+WATERMARK_OVERLAP = timedelta(minutes=10)
+# Janela usada na primeira sincronização por last_updated, sem marca d'água
+BOOTSTRAP_WINDOW = timedelta(days=30)
+
+
+# ---------------- BUSCA ASSÍNCRONA ----------------
+async def _buscar_pagina(client, token: str, params: dict, offset: int,
+                         sem_loja: asyncio.Semaphore, sem_global: asyncio.Semaphore) -> dict:
+    """
+    Busca uma página de /orders/search respeitando o limite da loja e o global.
+    O ritmo e as novas tentativas (429/5xx) ficam a cargo do agendador compartilhado.
+    """
+    async with sem_loja, sem_global:
+        resp = await executar_async(lambda: client.get(
+            ORDERS_URL,
+            params={**params, "offset": offset},
+            headers={"Authorization": f"Bearer {token}"},
+        ))
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def fetch_orders_async(client, store: str, seller_id: int, start_date=None, end_date=None,
+                             status="paid", sem_global: asyncio.Semaphore = None,
+                             limite_loja: int = LIMITE_POR_LOJA, date_field="date_created") -> list:
+    """
+    Versão assíncrona de fetch_orders_incremental: lê paging.total na primeira
+    página e busca os offsets restantes em paralelo (limitado por loja e global).
+    Janelas acima de OFFSET_MAX são divididas ao meio e buscadas em paralelo.
+    """
+    sem_loja = asyncio.Semaphore(limite_loja)
+    sem_global = sem_global or asyncio.Semaphore(LIMITE_GLOBAL)
+    token = await asyncio.to_thread(get_valid_token, store)
+
+    pedidos = await _fetch_window_async(client, store, token, seller_id, start_date, end_date,
+                                        status, date_field, sem_loja, sem_global)
+    print(f"[INFO] {store}: {len(pedidos)} pedidos coletados.")
+    return pedidos
+
+
+async def _fetch_window_async(client, store: str, token: str, seller_id: int, start_date, end_date,
+                              status, date_field, sem_loja: asyncio.Semaphore,
+                              sem_global: asyncio.Semaphore) -> list:
+    params = params_incremental(seller_id, start_date, end_date, status, date_field)
+
+    primeira = await _buscar_pagina(client, token, params, 0, sem_loja, sem_global)
+    total = primeira.get("paging", {}).get("total", 0)
+
+    metades = precisa_dividir(store, total, start_date, end_date)
+    if metades:
+        partes = await asyncio.gather(*[
+            _fetch_window_async(client, store, token, seller_id, inicio, fim, status, date_field,
+                                sem_loja, sem_global)
+            for inicio, fim in metades
+        ])
+        return [pedido for parte in partes for pedido in parte]
+
+    pedidos = list(primeira.get("results", []))
+    paginas = await asyncio.gather(*[
+        _buscar_pagina(client, token, params, offset, sem_loja, sem_global)
+        for offset in range(PAGE_SIZE, min(total, OFFSET_MAX), PAGE_SIZE)
+    ])
+    for data in paginas:
+        pedidos.extend(data.get("results", []))
+    return pedidos
+
+
+async def sync_store_async(client, job: dict, sem_global: asyncio.Semaphore,
+                           limite_loja: int = LIMITE_POR_LOJA) -> int:
+    """
+    Sincroniza uma loja: busca os pedidos do intervalo e acrescenta um segmento
+    ao store de pedidos do job (custo proporcional aos pedidos novos).
+    Com job["mode"] == "last_updated", usa a sincronização por data de atualização.
+    """
+    if job.get("mode") == "last_updated":
+        return await sync_store_last_updated_async(client, job, sem_global, limite_loja)
+
+    inicio_execucao = time.monotonic()
+    order_store = OrderStore(job["path"])
+    novos = await fetch_orders_async(
+        client,
+        job["store"],
+        job["seller_id"],
+        start_date=job.get("start_date"),
+        end_date=job.get("end_date"),
+        sem_global=sem_global,
+        limite_loja=limite_loja,
+    )
+    # Sem data de corte a busca traz o histórico inteiro: descarta o que já está gravado
+    skip_known = not job.get("start_date")
+    gravados = await asyncio.to_thread(order_store.append, novos, skip_known)
+    order_store.update_meta(
+        last_run=_estatisticas_execucao("date_created", inicio_execucao, len(novos), gravados),
+    )
+    if gravados:
+        print(f"[INFO] {gravados} pedidos gravados no store de {job['store']}.")
+    else:
+        print(f"[INFO] Nenhum pedido novo para {job['store']}.")
+    return gravados
+
+
+def _estatisticas_execucao(modo: str, inicio: float, coletados: int, gravados: int) -> dict:
+    return {
+        "at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "mode": modo,
+        "fetched": coletados,
+        "written": gravados,
+        "duration_s": round(time.monotonic() - inicio, 2),
+    }
+
+
+async def sync_store_last_updated_async(client, job: dict, sem_global: asyncio.Semaphore,
+                                        limite_loja: int = LIMITE_POR_LOJA) -> int:
+    """
+    Busca pedidos de qualquer status cujo last_updated é posterior à marca d'água
+    da loja e grava a versão nova (upsert: na leitura do store vale a mais recente).
+    Assim cancelamentos, devoluções e mediações chegam sem uma busca completa.
+    A marca d'água fica em meta.json do store e só avança depois da gravação.
+    """
+    inicio_execucao = time.monotonic()
+    order_store = OrderStore(job["path"])
+    meta = order_store.read_meta()
+    agora = datetime.now(timezone.utc).replace(microsecond=0)
+
+    watermark = meta.get("last_updated_watermark")
+    if watermark:
+        inicio = (_parse_iso(watermark) - WATERMARK_OVERLAP).isoformat()
+    elif job.get("start_date"):
+        inicio = job["start_date"]
+    else:
+        inicio = (agora - BOOTSTRAP_WINDOW).isoformat()
+
+    print(f"[INFO] {job['store']}: buscando pedidos atualizados desde {inicio}")
+    alterados = await fetch_orders_async(
+        client,
+        job["store"],
+        job["seller_id"],
+        start_date=inicio,
+        end_date=agora.isoformat(),
+        status=None,
+        sem_global=sem_global,
+        limite_loja=limite_loja,
+        date_field="last_updated",
+    )
+    gravados = await asyncio.to_thread(order_store.append, alterados)
+    order_store.update_meta(
+        last_updated_watermark=agora.isoformat(),
+        last_run=_estatisticas_execucao("last_updated", inicio_execucao, len(alterados), gravados),
+    )
+    print(f"[INFO] {gravados} pedidos novos/atualizados gravados no store de {job['store']}.")
+    return gravados
+
+
+async def sync_stores_async(jobs: list, limite_global: int = LIMITE_GLOBAL,
+                            limite_loja: int = LIMITE_POR_LOJA) -> dict:
+    """
+    Sincroniza todas as lojas ao mesmo tempo.
+    Retorna {loja: qtd_novos} ou {loja: Exception} para a loja que falhou,
+    sem interromper as demais.
+    """
+    sem_global = asyncio.Semaphore(limite_global)
+    async with criar_cliente_async(pool_size=limite_global) as client:
+        resultados = await asyncio.gather(
+            *[sync_store_async(client, job, sem_global, limite_loja) for job in jobs],
+            return_exceptions=True,
+        )
+    print(f"[INFO] Agendador: {get_scheduler().resumo()}")
+    return {job["store"]: res for job, res in zip(jobs, resultados)}
+
+
+def sync_stores(jobs: list, limite_global: int = LIMITE_GLOBAL,
+                limite_loja: int = LIMITE_POR_LOJA) -> dict:
+    """
+    Ponto de entrada síncrono do motor de sincronização.
+    Cada job é um dict com store, seller_id, path e, opcionalmente, start_date/end_date
+    e mode ("date_created", padrão, ou "last_updated").
+    """
+    return asyncio.run(sync_stores_async(jobs, limite_global, limite_loja))
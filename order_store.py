@@ -0,0 +1,331 @@
+import io
+import os
+import gzip
+import json
+from pathlib import Path
+from datetime import datetime
+from ml_client import file_lock, write_json_atomic
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem ele os segmentos usam gzip
+    zstandard = None
+
+# ---------------- CONFIGURAÇÕES ----------------
+# Acima desta quantidade de segmentos, o append dispara a compactação
+COMPACT_THRESHOLD = int(os.getenv("ORDER_STORE_COMPACT_THRESHOLD", "48"))
+SEGMENT_PREFIX = "seg-"
+SEGMENT_SUFFIX = ".jsonl"
+META_FILE = "meta.json"
+# Compressão dos segmentos novos: "gzip" (padrão), "zstd" ou "none"
+COMPRESSION = os.getenv("ORDER_STORE_COMPRESSION", "gzip").lower()
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+EXTENSOES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+# Espera máxima pelo lock do store: um append pode ficar atrás de uma compactação longa
+LOCK_TIMEOUT = float(os.getenv("ORDER_STORE_LOCK_TIMEOUT", "900"))
+
+if COMPRESSION == "zstd" and zstandard is None:
+    print("[WARN] ORDER_STORE_COMPRESSION=zstd, mas o pacote zstandard não está instalado; usando gzip.")
+    COMPRESSION = "gzip"
+
+
+# ---------------- ARQUIVOS COMPRIMIDOS ----------------
+def _compressao_de(path) -> str:
+    sufixos = Path(path).suffixes
+    if ".gz" in sufixos:
+        return "gzip"
+    if ".zst" in sufixos:
+        return "zstd"
+    return "none"
+
+
+def open_text(path, mode: str = "r"):
+    """
+    Abre um arquivo de texto UTF-8 para leitura ("r"), escrita ("w") ou acréscimo ("a"),
+    com compressão em fluxo conforme a extensão: .gz (gzip), .zst (zstd) ou nenhuma.
+    Acréscimos geram um novo membro/frame, que a leitura concatena normalmente.
+    """
+    compressao = _compressao_de(path)
+    if compressao == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    if compressao == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"Pacote zstandard não instalado: não é possível abrir {path}")
+        bruto = open(path, mode + "b")
+        if mode == "r":
+            fluxo = zstandard.ZstdDecompressor().stream_reader(bruto, read_across_frames=True, closefd=True)
+            return io.TextIOWrapper(io.BufferedReader(fluxo), encoding="utf-8")
+        fluxo = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(bruto, closefd=True)
+        return io.TextIOWrapper(fluxo, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def store_dir_for(json_path) -> Path:
+    """
+    Diretório do store ao lado do backup legado: backup_vendas_sp.json -> backup_vendas_sp_store/
+    """
+    path = Path(json_path)
+    return path.with_name(f"{path.stem}_store")
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _read_legacy(path: Path) -> list:
+    """Lê um backup JSON legado: lista de pedidos ou dict com a chave 'orders'."""
+    with open_text(path) as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else data.get("orders", [])
+
+
+class OrderStore:
+    """
+    Armazena pedidos brutos em segmentos JSON Lines somente-acréscimo.
+    - Cada append grava um segmento novo de forma atômica (arquivo .tmp + os.replace).
+    - Um pedido pode aparecer em mais de um segmento; na leitura vale a versão
+      do segmento mais recente (por id).
+    - A compactação reescreve tudo em um único segmento sem duplicatas.
+    - Segmentos são comprimidos (COMPRESSION); segmentos antigos sem compressão
+      continuam legíveis e são convertidos na próxima compactação.
+    Na primeira abertura, um backup legado (lista JSON em json_path) é importado.
+    """
+
+    def __init__(self, json_path):
+        self.json_path = Path(json_path)
+        self.dir = store_dir_for(json_path)
+
+    def exists(self) -> bool:
+        return bool(self.segments()) or self.json_path.exists()
+
+    # ---------------- SEGMENTOS ----------------
+    def segments(self) -> list:
+        if not self.dir.exists():
+            return []
+        extensoes = {SEGMENT_SUFFIX + ext for ext in EXTENSOES.values()}
+        return sorted(
+            seg for seg in self.dir.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}*")
+            if seg.name[seg.name.index("."):] in extensoes
+        )
+
+    @staticmethod
+    def _seq(seg: Path) -> int:
+        return int(seg.name[len(SEGMENT_PREFIX):seg.name.index(".")])
+
+    def _next_segment(self) -> Path:
+        segs = self.segments()
+        seq = self._seq(segs[-1]) + 1 if segs else 1
+        return self.dir / f"{SEGMENT_PREFIX}{seq:08d}{SEGMENT_SUFFIX}{EXTENSOES[COMPRESSION]}"
+
+    def _write_segment(self, pedidos, desde: str = None) -> dict:
+        """
+        Grava um segmento e devolve estatísticas do que foi escrito:
+        total de linhas, maior date_created e quantos pedidos são posteriores a 'desde'.
+        """
+        destino = self._next_segment()
+        tmp = destino.with_name(destino.name + ".tmp")
+        desde_dt = _parse_date(desde)
+        stats = {"rows": 0, "new": 0, "date_created_max": desde}
+        maior = desde_dt
+        with open_text(tmp, "w") as f:
+            for pedido in pedidos:
+                f.write(json.dumps(pedido, ensure_ascii=False) + "\n")
+                stats["rows"] += 1
+                criado = _parse_date(pedido.get("date_created"))
+                if criado is None:
+                    continue
+                if desde_dt is None or criado > desde_dt:
+                    stats["new"] += 1
+                if maior is None or criado > maior:
+                    maior = criado
+                    stats["date_created_max"] = pedido["date_created"]
+        # fsync pelo descritor do arquivo em disco (o objeto de texto pode ser um compressor)
+        with open(tmp, "rb+") as bruto:
+            os.fsync(bruto.fileno())
+        os.replace(tmp, destino)
+        return stats
+
+    def _lock(self):
+        # file_lock renova o lock enquanto ele está em uso: compactações, importação do
+        # legado e skip_known podem passar do prazo de lock abandonado sem perdê-lo
+        return file_lock(self.dir / "store", timeout=LOCK_TIMEOUT)
+
+    def _import_legacy(self):
+        """Importa o backup JSON legado como primeiro segmento (apenas uma vez)."""
+        if self.segments() or not self.json_path.exists():
+            return
+        legado = _read_legacy(self.json_path)
+        if legado:
+            stats = self._write_segment(legado)
+            self._update_meta_locked(order_count=stats["rows"], date_created_max=stats["date_created_max"])
+            print(f"[INFO] {len(legado)} pedidos importados de {self.json_path} para {self.dir}")
+
+    # ---------------- ESCRITA ----------------
+    def append(self, pedidos: list, skip_known: bool = False) -> int:
+        """
+        Grava os pedidos em um novo segmento. O custo depende só de len(pedidos).
+        Com skip_known=True descarta ids já gravados (exige ler o histórico;
+        use apenas quando a busca não parte de uma data de corte).
+        Retorna quantos pedidos foram gravados.
+        """
+        if not pedidos:
+            return 0
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with self._lock():
+            self._import_legacy()
+            if skip_known:
+                conhecidos = {p.get("id") for p in self.iter_orders()}
+                pedidos = [p for p in pedidos if p.get("id") not in conhecidos]
+                if not pedidos:
+                    return 0
+            meta = self.read_meta()
+            # Pedidos criados após a marca d'água são novos; os demais são versões atualizadas
+            stats = self._write_segment(pedidos, desde=meta.get("date_created_max"))
+            self._update_meta_locked(
+                order_count=meta.get("order_count", 0) + stats["new"],
+                date_created_max=stats["date_created_max"],
+                segments=len(self.segments()),
+            )
+            segs = self.segments()
+            # Segmentos em outro formato (ex.: sem compressão, de versões anteriores) são migrados
+            precisa_compactar = (len(segs) > COMPACT_THRESHOLD
+                                 or any(_compressao_de(seg) != COMPRESSION for seg in segs))
+        if precisa_compactar:
+            self.compact()
+        return len(pedidos)
+
+    def rewrite(self, pedidos: list):
+        """Substitui todo o conteúdo do store pelos pedidos informados."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with self._lock():
+            antigos = self.segments()
+            stats = self._write_segment(pedidos)
+            for seg in antigos:
+                seg.unlink()
+            self._update_meta_locked(order_count=stats["rows"], date_created_max=stats["date_created_max"],
+                                     segments=1)
+
+    def compact(self) -> int:
+        """
+        Reescreve todos os segmentos em um único, mantendo a última versão de cada pedido.
+        O segmento compactado é gravado antes de remover os antigos: uma queda no meio
+        deixa apenas duplicatas, que a leitura já resolve.
+        """
+        with self._lock():
+            antigos = self.segments()
+            # Um único segmento só é reescrito se estiver em outro formato de compressão
+            if not antigos or (len(antigos) == 1 and _compressao_de(antigos[0]) == COMPRESSION):
+                return 0
+            stats = self._write_segment(self.iter_orders())
+            for seg in antigos:
+                seg.unlink()
+            # Após compactar não há duplicatas: a contagem passa a ser exata
+            self._update_meta_locked(order_count=stats["rows"], date_created_max=stats["date_created_max"],
+                                     segments=1)
+        print(f"[INFO] Store {self.dir.name}: {len(antigos)} segmentos compactados.")
+        return len(antigos)
+
+    # ---------------- METADADOS ----------------
+    def read_meta(self) -> dict:
+        """
+        Metadados persistentes da loja, atualizados atomicamente a cada commit:
+        date_created_max, order_count, segments, last_updated_watermark e last_run.
+        """
+        path = self.dir / META_FILE
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _update_meta_locked(self, **campos) -> dict:
+        meta = self.read_meta()
+        meta.update(campos)
+        write_json_atomic(self.dir / META_FILE, meta)
+        return meta
+
+    def update_meta(self, **campos) -> dict:
+        """Atualiza campos de meta.json (ler-modificar-gravar sob o lock do store)."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with self._lock():
+            return self._update_meta_locked(**campos)
+
+    def high_water_mark(self):
+        """
+        Maior date_created gravado, lido de meta.json em O(1).
+        Stores criados antes dos metadados são varridos uma única vez.
+        """
+        meta = self.read_meta()
+        if "date_created_max" in meta:
+            return meta["date_created_max"]
+        if not self.exists():
+            return None
+
+        maior, valor = None, None
+        contagem = 0
+        for pedido in self.iter_orders():
+            contagem += 1
+            criado = _parse_date(pedido.get("date_created"))
+            if criado is not None and (maior is None or criado > maior):
+                maior, valor = criado, pedido["date_created"]
+        if self.dir.exists():
+            self.update_meta(date_created_max=valor, order_count=contagem, segments=len(self.segments()))
+        return valor
+
+    # ---------------- LEITURA ----------------
+    @staticmethod
+    def _read_segment(seg: Path):
+        with open_text(seg) as f:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+
+    def iter_orders(self, segments: list = None):
+        """
+        Itera sobre os pedidos (um por id, versão mais recente) sem carregar tudo em memória.
+        Com 'segments', considera apenas esses segmentos (ex.: os gravados desde a última leitura).
+        """
+        if segments is not None:
+            yield from self._iter_latest(segments)
+            return
+        segs = self.segments()
+        if not segs:
+            # Store ainda não criado: lê o backup legado diretamente
+            if self.json_path.exists():
+                yield from _read_legacy(self.json_path)
+            return
+        yield from self._iter_latest(segs)
+
+    def _iter_latest(self, segs: list):
+        if len(segs) == 1:
+            yield from self._read_segment(segs[0])
+            return
+
+        # 1ª passada: em qual segmento/linha está a última versão de cada id
+        ultimo = {}
+        for i, seg in enumerate(segs):
+            for j, pedido in enumerate(self._read_segment(seg)):
+                ultimo[pedido.get("id")] = (i, j)
+
+        # 2ª passada: emite somente a última versão
+        for i, seg in enumerate(segs):
+            for j, pedido in enumerate(self._read_segment(seg)):
+                if ultimo.get(pedido.get("id")) == (i, j):
+                    yield pedido
+
+
+def iter_orders(json_path):
+    """
+    Itera sobre os pedidos brutos de uma loja, esteja no store ou no backup JSON legado.
+    """
+    return OrderStore(json_path).iter_orders()
+
+
+def load_orders(json_path) -> list:
+    """Carrega todos os pedidos brutos em uma lista."""
+    return list(iter_orders(json_path))
@@ -0,0 +1,302 @@
+# scripts/benchmark_sync.py
+"""
+Benchmark ponta a ponta da ingestão de pedidos contra o mock local da API.
+
+Para cada tamanho de dataset sobe scripts/mock_ml_api.py e mede, em processos
+separados (para o pico de RSS ser de cada cenário):
+  - incremental: save_orders_incremental do histórico completo de uma loja;
+  - update_once: atualização horária (MG e SP) sobre um store já populado;
+  - backfill:    busca mensal de update_all.fetch_orders_in_batches.
+
+Métricas: requisições/s, pedidos/s, pico de RSS, bytes gravados e tempo total.
+Os resultados são acrescentados em benchmarks/resultados_sync.jsonl (fora do git;
+outro arquivo com --resultados) com o commit atual, e a tabela final compara com a
+última medição de outro commit.
+
+Uso:
+    python scripts/benchmark_sync.py --tamanhos 10000,100000 --cenarios incremental,update_once
+    python scripts/benchmark_sync.py --latencia-ms 30 --taxa-429 0.01
+    python scripts/benchmark_sync.py --resultados /tmp/resultados_sync.jsonl
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+
+# ---------------- CONFIGURAÇÕES ----------------
+CENARIOS = ("incremental", "update_once", "backfill")
+TAMANHOS_PADRAO = (10_000, 100_000, 1_000_000)
+RESULTADOS_PADRAO = BASE_PATH / "benchmarks" / "resultados_sync.jsonl"
+MOCK_SCRIPT = BASE_PATH / "scripts" / "mock_ml_api.py"
+PORTA_PADRAO = 8765
+SELLERS = {"MG": 101, "SP": 202}
+MARCADOR_RESULTADO = "RESULTADO_BENCHMARK "
+
+
+# ---------------- MEDIÇÕES ----------------
+def _pico_rss_mb():
+    """Pico de memória residente do processo atual (None onde não há o módulo resource)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _tamanho_dir(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _requisicoes_mock(api_base: str) -> int:
+    return httpx.get(f"{api_base}/_mock/stats", timeout=10).json()["requests"]
+
+
+def _configurar_ambiente(api_base: str, workdir: Path):
+    """Aponta os módulos para o mock e para o diretório temporário do cenário."""
+    os.environ["ML_API_BASE"] = api_base
+    for loja, seller_id in SELLERS.items():
+        os.environ[f"{loja}_JSON_PATH"] = str(workdir / f"backup_vendas_{loja.lower()}.json")
+        os.environ[f"{loja}_SELLER_ID"] = str(seller_id)
+        # Token vencido: o primeiro acesso passa pelo refresh em /oauth/token
+        os.environ[f"{loja}_TOKEN_JSON"] = json.dumps({
+            "access_token": "APP_USR-benchmark",
+            "refresh_token": "TG-benchmark",
+            "expires_in": 21600,
+            "_obtained_at": 0,
+        })
+    os.chdir(workdir)
+    sys.path.insert(0, str(BASE_PATH))
+    sys.path.insert(0, str(BASE_PATH / "scripts"))
+
+
+# ---------------- CENÁRIOS (executados no processo filho) ----------------
+def _historico_completo():
+    fim = datetime.now(timezone.utc)
+    return (fim - timedelta(days=4 * 365)).isoformat(), fim.isoformat()
+
+
+def _cenario_incremental(workdir: Path) -> int:
+    from ml_client import save_orders_incremental
+
+    inicio, fim = _historico_completo()
+    return save_orders_incremental("MG", SELLERS["MG"], os.environ["MG_JSON_PATH"], inicio, fim)
+
+
+def _cenario_preparar(workdir: Path) -> int:
+    """Popula os stores de MG e SP (não medido) para o cenário update_once."""
+    from ml_sync import sync_stores
+
+    inicio, fim = _historico_completo()
+    jobs = [{"store": loja, "seller_id": seller_id, "path": os.environ[f"{loja}_JSON_PATH"],
+             "start_date": inicio, "end_date": fim} for loja, seller_id in SELLERS.items()]
+    return sum(sync_stores(jobs).values())
+
+
+def _cenario_update_once(workdir: Path) -> int:
+    from update_once import update_once
+    from order_store import OrderStore
+
+    update_once()
+    return sum(
+        OrderStore(os.environ[f"{loja}_JSON_PATH"]).read_meta().get("last_run", {}).get("fetched", 0)
+        for loja in SELLERS
+    )
+
+
+def _cenario_backfill(workdir: Path) -> int:
+    import update_all
+
+    update_all.OUTPUT_DIR = workdir
+    saida = update_all.backfill_path("MG")
+    update_all.START_DATE = datetime.utcnow() - timedelta(days=4 * 365)
+    update_all.fetch_orders_in_batches("MG", SELLERS["MG"], saida, reset=True)
+    return len(update_all.load_existing_ids(saida))
+
+
+EXECUTORES = {
+    "preparar": _cenario_preparar,
+    "incremental": _cenario_incremental,
+    "update_once": _cenario_update_once,
+    "backfill": _cenario_backfill,
+}
+
+
+def executar_cenario(cenario: str, api_base: str, workdir: Path):
+    """Roda um cenário no processo atual e imprime as métricas em uma linha JSON."""
+    _configurar_ambiente(api_base, workdir)
+    bytes_antes = _tamanho_dir(workdir)
+    requisicoes_antes = _requisicoes_mock(api_base)
+    inicio = time.perf_counter()
+    pedidos = EXECUTORES[cenario](workdir)
+    duracao = time.perf_counter() - inicio
+    requisicoes = _requisicoes_mock(api_base) - requisicoes_antes - 1
+
+    print(MARCADOR_RESULTADO + json.dumps({
+        "pedidos_processados": pedidos,
+        "requisicoes": requisicoes,
+        "tempo_s": round(duracao, 2),
+        "req_por_s": round(requisicoes / duracao, 1) if duracao else None,
+        "pedidos_por_s": round(pedidos / duracao, 1) if duracao else None,
+        "pico_rss_mb": _pico_rss_mb(),
+        "bytes_gravados": _tamanho_dir(workdir) - bytes_antes,
+    }), flush=True)
+
+
+# ---------------- ORQUESTRAÇÃO ----------------
+def _subir_mock(pedidos: int, porta: int, args) -> subprocess.Popen:
+    proc = subprocess.Popen([
+        sys.executable, str(MOCK_SCRIPT),
+        "--pedidos", str(pedidos), "--porta", str(porta),
+        "--latencia-ms", str(args.latencia_ms), "--taxa-429", str(args.taxa_429),
+    ])
+    api_base = f"http://127.0.0.1:{porta}"
+    for _ in range(100):
+        try:
+            _requisicoes_mock(api_base)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"Mock da API não respondeu em {api_base}")
+
+
+def _rodar_filho(cenario: str, api_base: str, workdir: Path, verbose: bool) -> dict:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--executar", cenario, "--api-base", api_base, "--workdir", str(workdir)],
+        capture_output=True, text=True, encoding="utf-8",
+    )
+    if verbose:
+        print(proc.stdout)
+    for linha in proc.stdout.splitlines():
+        if linha.startswith(MARCADOR_RESULTADO):
+            return json.loads(linha[len(MARCADOR_RESULTADO):])
+    raise RuntimeError(f"Cenário {cenario} falhou (código {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_PATH,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def _chave(res: dict) -> tuple:
+    return res["cenario"], res["pedidos"], res["latencia_ms"], res["taxa_429"]
+
+
+def _ultimos_de_outro_commit(resultados_path: Path, commit: str) -> dict:
+    """Última medição de cada configuração feita em um commit diferente do atual."""
+    anteriores = {}
+    if resultados_path.exists():
+        with open(resultados_path, "r", encoding="utf-8") as f:
+            for linha in f:
+                if linha.strip():
+                    res = json.loads(linha)
+                    if res["commit"] != commit:
+                        anteriores[_chave(res)] = res
+    return anteriores
+
+
+def _variacao(atual, anterior) -> str:
+    if not atual or not anterior:
+        return ""
+    return f" ({(atual - anterior) / anterior * 100:+.0f}%)"
+
+
+def exibir_tabela(resultados: list, anteriores: dict):
+    print(f"\n{'cenário':<12} {'pedidos':>9} {'tempo_s':>16} {'req/s':>8} {'pedidos/s':>18} "
+          f"{'RSS MB':>8} {'MB gravados':>12}")
+    for res in resultados:
+        ant = anteriores.get(_chave(res), {})
+        print(
+            f"{res['cenario']:<12} {res['pedidos']:>9} "
+            f"{str(res['tempo_s']) + _variacao(res['tempo_s'], ant.get('tempo_s')):>16} "
+            f"{res['req_por_s'] or 0:>8} "
+            f"{str(res['pedidos_por_s']) + _variacao(res['pedidos_por_s'], ant.get('pedidos_por_s')):>18} "
+            f"{res['pico_rss_mb'] or '-':>8} {res['bytes_gravados'] / 1e6:>12.1f}"
+        )
+    if anteriores:
+        print("Variações em relação à última medição de outro commit.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão de pedidos contra o mock da API")
+    parser.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS_PADRAO)),
+                        help="pedidos sintéticos por loja, separados por vírgula")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--latencia-ms", type=float, default=0)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída de cada cenário")
+    parser.add_argument("--resultados", type=Path, default=RESULTADOS_PADRAO,
+                        help="arquivo JSONL onde as medições são acrescentadas")
+    # Uso interno: execução de um cenário no processo filho
+    parser.add_argument("--executar", choices=sorted(EXECUTORES), help=argparse.SUPPRESS)
+    parser.add_argument("--api-base", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        executar_cenario(args.executar, args.api_base, Path(args.workdir))
+        return
+
+    cenarios = [c for c in args.cenarios.split(",") if c]
+    invalidos = set(cenarios) - set(CENARIOS)
+    if invalidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(invalidos))}")
+
+    commit = _commit_atual()
+    anteriores = _ultimos_de_outro_commit(args.resultados, commit)
+    args.resultados.parent.mkdir(parents=True, exist_ok=True)
+    api_base = f"http://127.0.0.1:{args.porta}"
+    resultados = []
+
+    for pedidos in (int(t) for t in args.tamanhos.split(",") if t):
+        print(f"[INFO] Subindo mock com {pedidos} pedidos por loja...")
+        mock = _subir_mock(pedidos, args.porta, args)
+        try:
+            for cenario in cenarios:
+                workdir = Path(tempfile.mkdtemp(prefix=f"bench_{cenario}_"))
+                try:
+                    if cenario == "update_once":
+                        _rodar_filho("preparar", api_base, workdir, args.verbose)
+                    print(f"[INFO] {cenario} com {pedidos} pedidos...")
+                    metricas = _rodar_filho(cenario, api_base, workdir, args.verbose)
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+                res = {
+                    "commit": commit,
+                    "data": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+                    "cenario": cenario,
+                    "pedidos": pedidos,
+                    "latencia_ms": args.latencia_ms,
+                    "taxa_429": args.taxa_429,
+                    **metricas,
+                }
+                resultados.append(res)
+                with open(args.resultados, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(res, ensure_ascii=False) + "\n")
+        finally:
+            mock.terminate()
+            mock.wait()
+
+    exibir_tabela(resultados, anteriores)
+    print(f"[INFO] Resultados acrescentados em {args.resultados}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# scripts/mock_ml_api.py
+"""
+Servidor local que imita a API do Mercado Livre para testes e benchmarks offline.
+
+Emula /oauth/token, /orders/search (paginação, filtros de data, teto de offset),
+/orders/{id}, busca e multi-get de itens, endpoints de advertising e product_ads.
+Permite injetar latência, respostas 429 (com Retry-After) e 5xx.
+
+Uso:
+    python scripts/mock_ml_api.py --pedidos 100000 --porta 8765 --latencia-ms 20 --taxa-429 0.02
+    ML_API_BASE=http://127.0.0.1:8765 python scripts/update_once.py
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import uvicorn
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+
+# ---------------- CONFIGURAÇÕES ----------------
+# Os pedidos sintéticos cobrem os últimos DIAS_HISTORICO dias até a subida do servidor
+DIAS_HISTORICO = 3 * 365
+OFFSET_MAX = 10000
+ANUNCIOS_POR_SELLER = 300
+CAMPANHAS_POR_ADVERTISER = 5
+TZ_VENDAS = timezone(timedelta(hours=-3))
+
+
+# ---------------- DADOS SINTÉTICOS ----------------
+class DatasetSintetico:
+    """
+    Pedidos gerados de forma determinística a partir do índice: só os timestamps
+    ficam em memória e cada pedido é montado sob demanda, então 1M de pedidos cabe
+    em poucas dezenas de MB.
+    """
+
+    def __init__(self, seller_id: int, n_pedidos: int, seed: int = 42, dias: int = DIAS_HISTORICO):
+        self.seller_id = seller_id
+        self.n = n_pedidos
+        self.seed = seed + seller_id
+        rng = random.Random(self.seed)
+        self.fim = fim = time.time()
+        inicio = fim - dias * 86400
+        self.criados = sorted(rng.uniform(inicio, fim) for _ in range(n_pedidos))
+        self.anuncios = [f"MLB{seller_id % 1000:03d}{i:06d}" for i in range(ANUNCIOS_POR_SELLER)]
+
+    def _rng(self, i: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + i)
+
+    def order_id(self, i: int) -> int:
+        return 2_000_000_000_000 + self.seller_id % 1000 * 100_000_000 + i
+
+    def indice(self, order_id: int) -> int:
+        return order_id - self.order_id(0)
+
+    def atualizado(self, i: int) -> float:
+        # Alguns pedidos são atualizados até 2 dias após a criação (cancelamentos, mediações)
+        return min(self.criados[i] + self._rng(i).uniform(0, 2 * 86400), self.fim)
+
+    def status(self, i: int) -> str:
+        return "cancelled" if self._rng(i).random() < 0.03 else "paid"
+
+    def pedido(self, i: int) -> dict:
+        rng = self._rng(i)
+        criado = datetime.fromtimestamp(self.criados[i], TZ_VENDAS)
+        atualizado = datetime.fromtimestamp(self.atualizado(i), TZ_VENDAS)
+        itens = []
+        for _ in range(1 if rng.random() < 0.85 else rng.randint(2, 4)):
+            anuncio = rng.randrange(ANUNCIOS_POR_SELLER)
+            itens.append({
+                "item": {
+                    "id": self.anuncios[anuncio],
+                    "title": f"Produto sintético {anuncio}",
+                    "seller_sku": f"789{anuncio:010d}",
+                },
+                "quantity": rng.randint(1, 5),
+                "unit_price": round(rng.uniform(10, 300), 2),
+            })
+        return {
+            "id": self.order_id(i),
+            "status": self.status(i),
+            "date_created": criado.isoformat(timespec="milliseconds"),
+            "last_updated": atualizado.isoformat(timespec="milliseconds"),
+            "total_amount": round(sum(it["quantity"] * it["unit_price"] for it in itens), 2),
+            "seller": {"id": self.seller_id},
+            "order_items": itens,
+        }
+
+    @lru_cache(maxsize=256)
+    def buscar(self, status, campo, desde, ate) -> tuple:
+        """Índices que atendem aos filtros, em ordem crescente de date_created."""
+        if campo == "date_created" and desde is not None:
+            candidatos = range(bisect_left(self.criados, desde), bisect_right(self.criados, ate))
+        elif campo == "last_updated" and desde is not None:
+            # last_updated >= date_created e no máximo 2 dias depois
+            candidatos = (
+                i for i in range(bisect_left(self.criados, desde - 2 * 86400), bisect_right(self.criados, ate))
+                if desde <= self.atualizado(i) <= ate
+            )
+        else:
+            candidatos = range(self.n)
+        if status:
+            return tuple(i for i in candidatos if self.status(i) == status)
+        return tuple(candidatos)
+
+
+def _ts(valor: str):
+    if not valor:
+        return None
+    dt = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# ---------------- APLICAÇÃO ----------------
+def criar_app(n_pedidos: int = 10000, latencia_ms: float = 0, taxa_429: float = 0.0,
+              taxa_5xx: float = 0.0, retry_after: float = 1.0, seed: int = 42,
+              dias: int = DIAS_HISTORICO) -> FastAPI:
+    app = FastAPI(title="Mock Mercado Livre API")
+    datasets = {}
+    rng = random.Random(seed)
+    app.state.contadores = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def dataset(seller_id: int) -> DatasetSintetico:
+        if seller_id not in datasets:
+            datasets[seller_id] = DatasetSintetico(seller_id, n_pedidos, seed, dias)
+        return datasets[seller_id]
+
+    @app.middleware("http")
+    async def falhas_e_latencia(request: Request, call_next):
+        app.state.contadores["requests"] += 1
+        if latencia_ms:
+            await asyncio.sleep(latencia_ms / 1000)
+        if request.url.path not in ("/oauth/token", "/_mock/stats"):
+            sorteio = rng.random()
+            if sorteio < taxa_429:
+                app.state.contadores["throttled"] += 1
+                return JSONResponse({"message": "too_many_requests"}, status_code=429,
+                                    headers={"Retry-After": str(retry_after)})
+            if sorteio < taxa_429 + taxa_5xx:
+                app.state.contadores["errors"] += 1
+                return JSONResponse({"message": "internal_error"}, status_code=503)
+        return await call_next(request)
+
+    @app.post("/oauth/token")
+    async def oauth_token():
+        agora = int(time.time())
+        return {
+            "access_token": f"APP_USR-mock-{agora}",
+            "refresh_token": f"TG-mock-{agora}",
+            "token_type": "bearer",
+            "expires_in": 21600,
+        }
+
+    @app.get("/orders/search")
+    async def orders_search(request: Request):
+        q = request.query_params
+        ds = dataset(int(q.get("seller", 0)))
+        offset, limit = int(q.get("offset", 0)), min(int(q.get("limit", 50)), 50)
+        if offset > OFFSET_MAX:
+            raise HTTPException(status_code=400, detail=f"offset maior que {OFFSET_MAX}")
+
+        campo, desde, ate = None, None, None
+        for nome in ("date_created", "last_updated"):
+            if q.get(f"order.{nome}.from"):
+                campo, desde, ate = nome, _ts(q[f"order.{nome}.from"]), _ts(q.get(f"order.{nome}.to"))
+        indices = ds.buscar(q.get("status"), campo, desde, ate if ate is not None else float("inf"))
+
+        if q.get("sort", "date_asc") == "date_desc":
+            pagina = [indices[-1 - k] for k in range(offset, min(offset + limit, len(indices)))]
+        else:
+            pagina = indices[offset:offset + limit]
+        return {
+            "results": [ds.pedido(i) for i in pagina],
+            "paging": {"total": len(indices), "offset": offset, "limit": limit},
+        }
+
+    @app.get("/orders/{order_id}")
+    async def order(order_id: int):
+        # O id codifica o seller (seller_id % 1000); sellers ainda não consultados são criados
+        candidatos = [ds for ds in datasets.values() if 0 <= ds.indice(order_id) < ds.n]
+        if not candidatos:
+            seller_id = (order_id - 2_000_000_000_000) // 100_000_000
+            if 0 < seller_id < 1000:
+                candidatos = [dataset(seller_id)]
+        for ds in candidatos:
+            i = ds.indice(order_id)
+            if 0 <= i < ds.n:
+                return ds.pedido(i)
+        raise HTTPException(status_code=404, detail="order not found")
+
+    @app.get("/users/{seller_id}/items/search")
+    async def items_search(seller_id: int, request: Request):
+        q = request.query_params
+        anuncios = dataset(seller_id).anuncios
+        limit = int(q.get("limit", 50))
+        if q.get("search_type") == "scan":
+            inicio = int(q.get("scroll_id") or 0)
+            return {"results": anuncios[inicio:inicio + limit], "scroll_id": str(inicio + limit)}
+        offset = int(q.get("offset", 0))
+        return {"results": anuncios[offset:offset + limit],
+                "paging": {"total": len(anuncios), "offset": offset, "limit": limit}}
+
+    @app.get("/items")
+    async def items_multiget(ids: str):
+        resposta = []
+        for item_id in ids.split(",")[:20]:
+            n = int(item_id[-6:]) if item_id[-6:].isdigit() else 0
+            resposta.append({"code": 200, "body": {
+                "id": item_id,
+                "title": f"Produto sintético {n}",
+                "price": round(10 + n * 0.97, 2),
+                "available_quantity": n % 50,
+                "status": "active",
+                "seller_custom_field": f"789{n:010d}",
+            }})
+        return resposta
+
+    @app.get("/advertising/advertisers")
+    async def advertisers(product_id: str):
+        # Só parte dos anúncios tem Ads, como na API real
+        if not product_id[-6:].isdigit() or int(product_id[-6:]) % 7 != 3:
+            raise HTTPException(status_code=404, detail="advertiser not found")
+        return {"advertisers": [{"id": 900000 + int(product_id[3:6])}]}
+
+    @app.get("/advertising/campaigns")
+    async def campaigns(advertiser_id: int):
+        return {"campaigns": [
+            {"id": advertiser_id * 100 + k, "name": f"Campanha {k}"} for k in range(CAMPANHAS_POR_ADVERTISER)
+        ]}
+
+    @app.get("/advertising/campaigns/{campaign_id}/reports")
+    async def campaign_report(campaign_id: int, date_from: str, date_to: str):
+        dias = (datetime.fromisoformat(date_to) - datetime.fromisoformat(date_from)).days + 1
+        r = random.Random(f"{campaign_id}-{date_from}-{date_to}")
+        return {
+            "impressions": dias * r.randint(500, 5000),
+            "clicks": dias * r.randint(10, 200),
+            "cost": dias * r.randint(1000, 20000),
+            "conversions": dias * r.randint(0, 20),
+            "roas": round(r.uniform(1, 10), 2),
+        }
+
+    @app.get("/product_ads/campaigns")
+    async def product_ads_campaigns():
+        return {"results": [], "paging": {"total": 0}}
+
+    @app.get("/_mock/stats")
+    async def stats():
+        return app.state.contadores
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock local da API do Mercado Livre")
+    parser.add_argument("--pedidos", type=int, default=10000, help="pedidos sintéticos por seller")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=float, default=0)
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração de respostas 429")
+    parser.add_argument("--taxa-5xx", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="segundos no header Retry-After")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dias", type=int, default=DIAS_HISTORICO, help="dias de histórico até hoje")
+    args = parser.parse_args(argv)
+
+    app = criar_app(args.pedidos, args.latencia_ms, args.taxa_429, args.taxa_5xx, args.retry_after,
+                    args.seed, args.dias)
+    print(f"[INFO] Mock da API em http://127.0.0.1:{args.porta} ({args.pedidos} pedidos por seller)")
+    uvicorn.run(app, host="127.0.0.1", port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
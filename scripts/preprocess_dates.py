@@ -1,9 +1,20 @@
 import os
+import sys
 import json
+import shutil
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from order_store import OrderStore
+from utils.vendas_dataset import (
+    dataset_path_for, gravar_particoes, substituir_pedidos, cubo_path_for, agregar_cubo, gravar_cubo,
+    pedidos_dia_path_for, agregar_pedidos_dia, gravar_pedidos_dia,
+)
+
 # Caminhos base
 BASE_PATH = Path(__file__).parent.parent
 DESIGNER_PATH = BASE_PATH / "Designer"
@@ -20,78 +31,232 @@ OUTPUT_FILES = {
     "MG": BASE_PATH / "tokens" / "vendas" / "backup_vendas_mg_pp.json"
 }
 
-def preprocess_json(input_path, output_path, uf):
-    """Pré-processa JSON de vendas incluindo SKU e campos essenciais."""
-    if not input_path.exists():
+# Só pedidos pagos contam como venda. O sync por last_updated traz pedidos em qualquer
+# status (pendentes de pagamento, cancelados...) e a versão mais recente de cada pedido
+# vale: um pago que depois é cancelado sai das vendas no próximo preprocess.
+# Registros sem status (backups antigos, gravados só com status=paid) contam como pagos.
+STATUS_VENDA = {"paid", "partially_refunded"}
+
+PRODUTO_PADRAO = "Produto não identificado"
+COLUNAS_SAIDA = ["Data da venda", "Produto", "SKU", "Quantidade", "Valor total", "codigo_do_anuncio", "Unidade"]
+
+
+def _datas_venda(valores: pd.Series) -> pd.Series:
+    """
+    Converte todas as datas de uma vez para a data local (America/Sao_Paulo) em ISO.
+    Valores fora do ISO 8601 (raros, de backups antigos) caem no parse individual.
+    """
+    datas = pd.to_datetime(valores, errors="coerce", utc=True, format="ISO8601")
+    falhas = datas.isna() & valores.notna()
+    if falhas.any():
+        datas[falhas] = [pd.to_datetime(v, errors="coerce", utc=True) for v in valores[falhas]]
+    datas = pd.to_datetime(datas, utc=True)
+    return datas.dt.tz_convert("America/Sao_Paulo").dt.strftime("%Y-%m-%d")
+
+
+def achatar_pedidos(pedidos, uf: str) -> pd.DataFrame:
+    """
+    Transforma pedidos brutos em linhas de venda (uma por item), em lote:
+    datas convertidas numa única chamada e order_items achatados com explode/json_normalize.
+    Pedidos sem itens geram uma linha genérica com o valor total do pedido.
+    A coluna extra pedido_id identifica o pedido de origem de cada linha.
+    """
+    pedidos = [p for p in pedidos if p.get("status", "paid") in STATUS_VENDA]
+    if not pedidos:
+        return pd.DataFrame(columns=COLUNAS_SAIDA + ["pedido_id"])
+
+    df = pd.DataFrame({
+        "pedido_id": pd.Series([p.get("id") for p in pedidos], dtype=object),
+        "data": [p.get("date_created") or p.get("Data da venda") for p in pedidos],
+        "total": pd.Series([p.get("total_amount", 0) for p in pedidos], dtype=object),
+        "itens": [p.get("order_items", []) for p in pedidos],
+    })
+    df["Data da venda"] = _datas_venda(df["data"])
+    df = df[df["Data da venda"].notna()]
+    df["com_itens"] = [isinstance(i, list) and len(i) > 0 for i in df["itens"]]
+    df.loc[~df["com_itens"], "itens"] = None
+
+    linhas = df.explode("itens", ignore_index=True)
+    com_itens = linhas["com_itens"].to_numpy()
+
+    lista_itens = linhas.loc[com_itens, "itens"].tolist()
+    itens = pd.json_normalize(lista_itens)
+    for coluna in ("item.title", "item.seller_sku", "item.id"):
+        if coluna not in itens:
+            itens[coluna] = None
+    # Números lidos direto dos dicts para manter int/float como no JSON de origem
+    quantidade = [item.get("quantity", 0) for item in lista_itens]
+    valor = [round(item.get("unit_price", 0) * q, 2) for item, q in zip(lista_itens, quantidade)]
+    quantidade, valor = np.array(quantidade, dtype=object), np.array(valor, dtype=object)
+
+    saida = pd.DataFrame(index=linhas.index, columns=COLUNAS_SAIDA, dtype=object)
+    saida["Data da venda"] = linhas["Data da venda"]
+    saida.loc[com_itens, "Produto"] = itens["item.title"].fillna(PRODUTO_PADRAO).tolist()
+    saida.loc[com_itens, "SKU"] = itens["item.seller_sku"].fillna("").tolist()
+    saida.loc[com_itens, "Quantidade"] = quantidade
+    saida.loc[com_itens, "Valor total"] = valor
+    saida.loc[com_itens, "codigo_do_anuncio"] = itens["item.id"].fillna("").tolist()
+
+    sem_itens = ~com_itens
+    saida.loc[sem_itens, "Produto"] = PRODUTO_PADRAO
+    saida.loc[sem_itens, "SKU"] = ""
+    saida.loc[sem_itens, "Quantidade"] = 1
+    saida.loc[sem_itens, "Valor total"] = linhas.loc[sem_itens, "total"].tolist()
+    saida.loc[sem_itens, "codigo_do_anuncio"] = ""
+    saida["Unidade"] = uf
+    saida["pedido_id"] = linhas["pedido_id"]
+    return saida
+
+
+# Versão do formato das saídas; estado de outra versão força reconstrução completa
+FORMATO_SAIDA = 3
+
+
+def _estado_path(output_path) -> Path:
+    """Estado do pré-processamento ao lado da saída: backup_vendas_sp_pp.json -> backup_vendas_sp_pp.state.json"""
+    return Path(output_path).with_suffix(".state.json")
+
+
+def _ler_estado(output_path):
+    path = _estado_path(output_path)
+    saidas = (path, dataset_path_for(output_path), cubo_path_for(output_path), pedidos_dia_path_for(output_path))
+    if not all(saida.exists() for saida in saidas):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _gravar_atomico(path, data):
+    # Sem indentação: o json usa o encoder em C, bem mais rápido em arquivos grandes
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _gravar_estado(output_path, segmentos: list):
+    """
+    Gravado por último: uma queda antes dele só faz o próximo delta ser reaplicado,
+    o que é idempotente (as linhas dos pedidos do delta são substituídas de novo).
+    """
+    _gravar_atomico(_estado_path(output_path), {
+        "formato": FORMATO_SAIDA, "segmentos": segmentos, "status_venda": sorted(STATUS_VENDA),
+    })
+
+
+def _saida_vazia(output_path):
+    Path(output_path).unlink(missing_ok=True)
+    _estado_path(output_path).unlink(missing_ok=True)
+    shutil.rmtree(dataset_path_for(output_path), ignore_errors=True)
+    cubo_path_for(output_path).unlink(missing_ok=True)
+    pedidos_dia_path_for(output_path).unlink(missing_ok=True)
+
+
+def _segmentos_novos(estado, segmentos: list):
+    """
+    Segmentos do store ainda não processados, ou None quando é preciso reconstruir tudo:
+    sem estado, store ainda no backup legado, compactação (segmentos processados sumiram)
+    ou saída gerada em outro formato ou com outro filtro de status.
+    """
+    if not estado or not segmentos:
+        return None
+    if estado.get("formato") != FORMATO_SAIDA or estado.get("status_venda") != sorted(STATUS_VENDA):
+        return None
+    processados = estado.get("segmentos", [])
+    if not processados or not set(processados) <= set(segmentos):
+        return None
+    return [seg for seg in segmentos if seg not in set(processados)]
+
+
+def _meses_dos_pedidos(pedidos: list) -> set:
+    """
+    Meses (partições) onde estão as linhas dos pedidos. A partição de um pedido vem da
+    sua data de criação, que não muda entre versões: a versão antiga está no mesmo mês
+    da nova, inclusive quando a nova não gera linhas (pedido cancelado).
+    """
+    datas = _datas_venda(pd.Series([p.get("date_created") or p.get("Data da venda") for p in pedidos], dtype=object))
+    return {d[:7] for d in datas.dropna()}
+
+
+def _reconstruir(order_store, output_path, uf: str, segmentos: list):
+    df = achatar_pedidos(order_store.iter_orders(), uf)
+    gravar_particoes(dataset_path_for(output_path), df, uf)
+    gravar_cubo(cubo_path_for(output_path), agregar_cubo(df))
+    gravar_pedidos_dia(pedidos_dia_path_for(output_path), agregar_pedidos_dia(df))
+    _gravar_estado(output_path, segmentos)
+    # O dataset Parquet substitui o JSON com todas as linhas gerado pelas versões
+    # anteriores; uma cópia antiga ao lado só ficaria desatualizada
+    Path(output_path).unlink(missing_ok=True)
+    print(f"✅ {uf}: {len(df)} registros processados e salvos em {dataset_path_for(output_path)}")
+    if not df.empty:
+        resumo = df.groupby("Data da venda")["Quantidade"].sum().astype(int)
+        print(f"📊 {uf}: Vendas por dia:\n{resumo}")
+
+
+def preprocess_json(input_path, output_path, uf, completo=False):
+    """
+    Pré-processa as vendas da unidade: dataset Parquet por mês, cubo diário e pedidos
+    por dia, ao lado de output_path (que identifica a saída para utils.vendas_cache).
+    Incremental: só os pedidos dos segmentos gravados desde a última execução são
+    transformados, e só as partições dos meses desses pedidos são regravadas.
+    completo=True reconstrói tudo.
+    """
+    order_store = OrderStore(input_path)
+    if not order_store.exists():
         print(f"⚠️ {uf}: Arquivo não encontrado: {input_path}")
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        _saida_vazia(output_path)
         return
 
     try:
-        with open(input_path, "r", encoding="utf-8") as f:
-            vendas = json.load(f)
-
-        if not isinstance(vendas, list):
-            print(f"⚠️ {uf}: JSON não está no formato esperado (lista).")
-            vendas = []
-
-        registros = []
-        for record in vendas:
-            dt = record.get("date_created") or record.get("Data da venda")
-            dt_parsed = pd.to_datetime(dt, errors="coerce", utc=True)
-            if pd.notna(dt_parsed):
-                data_venda = dt_parsed.tz_convert("America/Sao_Paulo").date().isoformat()
-
-                order_items = record.get("order_items", [])
-                if isinstance(order_items, list) and order_items:
-                    for item in order_items:
-                        registros.append({
-                            "Data da venda": data_venda,
-                            "Produto": item.get("item", {}).get("title", "Produto não identificado"),
-                            "SKU": item.get("item", {}).get("seller_sku", ""),
-                            "Quantidade": item.get("quantity", 0),
-                            "Valor total": round(item.get("unit_price", 0) * item.get("quantity", 0), 2),
-                            "codigo_do_anuncio": item.get("item", {}).get("id", ""),
-                            "Unidade": uf
-                        })
-                else:
-                    registros.append({
-                        "Data da venda": data_venda,
-                        "Produto": "Produto não identificado",
-                        "SKU": "",
-                        "Quantidade": 1,
-                        "Valor total": record.get("total_amount", 0),
-                        "codigo_do_anuncio": "",
-                        "Unidade": uf
-                    })
-
-        # Salva o arquivo processado
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(registros, f, ensure_ascii=False, indent=2)
-
-        print(f"✅ {uf}: {len(registros)} registros processados e salvos em {output_path}")
-
-        if registros:
-            df = pd.DataFrame(registros)
-            resumo = df.groupby("Data da venda")["Quantidade"].sum()
-            print(f"📊 {uf}: Vendas por dia:\n{resumo}")
+        segs = order_store.segments()
+        nomes = [seg.name for seg in segs]
+        novos = None if completo else _segmentos_novos(_ler_estado(output_path), nomes)
+
+        if novos is None:
+            _reconstruir(order_store, output_path, uf, nomes)
+            return
+
+        if not novos:
+            print(f"✅ {uf}: nenhum pedido novo ou alterado desde a última execução.")
+            return
+
+        # Delta: pedidos dos segmentos novos (última versão de cada um)
+        pedidos = list(order_store.iter_orders(segments=[seg for seg in segs if seg.name in set(novos)]))
+        alterados = {p.get("id") for p in pedidos}
+        df = achatar_pedidos(pedidos, uf)
+        meses = _meses_dos_pedidos(pedidos)
+
+        atual, removidas = substituir_pedidos(dataset_path_for(output_path), uf, df, alterados, meses)
+        gravar_cubo(cubo_path_for(output_path), agregar_cubo(atual), meses)
+        gravar_pedidos_dia(pedidos_dia_path_for(output_path), agregar_pedidos_dia(atual), meses)
+        _gravar_estado(output_path, nomes)
+        print(f"✅ {uf}: {len(alterados)} pedidos novos/alterados em {len(novos)} segmento(s): "
+              f"+{len(df)} / -{removidas} registros em {len(meses)} mês(es)")
 
     except Exception as e:
+        # Saídas anteriores ficam como estão: o estado só é gravado no fim, então a
+        # próxima execução reaplica o mesmo delta
         print(f"❌ {uf}: Erro ao processar {input_path}: {e}")
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        raise
 
 def main():
+    completo = "--full" in sys.argv
     print("🔄 Iniciando pré-processamento de vendas...")
     print(f"📂 Pasta de trabalho: {DESIGNER_PATH}")
 
     DESIGNER_PATH.mkdir(exist_ok=True)
 
+    falhas = []
     for uf, input_path in INPUT_FILES.items():
         print(f"\n--- Processando {uf} ---")
-        preprocess_json(input_path, OUTPUT_FILES[uf], uf)
+        try:
+            preprocess_json(input_path, OUTPUT_FILES[uf], uf, completo=completo)
+        except Exception:
+            falhas.append(uf)
 
+    if falhas:
+        print(f"\n❌ Pré-processamento falhou para: {', '.join(falhas)} (saídas anteriores mantidas)")
+        sys.exit(1)
     print("\n✅ Pré-processamento concluído!")
 
 if __name__ == "__main__":
@@ -1,14 +1,22 @@
 import os
+import sys
 import json
+import zlib
 from pathlib import Path
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from ml_client import load_config, fetch_orders_incremental
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 # ---------------- CONFIGURAÇÕES ----------------
 BASE_PATH = Path(__file__).parent.parent
+# Antes dos imports abaixo: ml_http, ml_ratelimit e order_store leem o ENV ao serem importados
 load_dotenv(BASE_PATH / ".env")
 
+from ml_client import load_config, fetch_orders_incremental, write_json_atomic
+from order_store import open_text, zstandard, COMPRESSION, EXTENSOES
+
 OUTPUT_DIR = BASE_PATH / "Designer"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -18,64 +26,215 @@ LOJAS = ["SP", "MG"]
 # Data inicial (pode ser ajustada para o início do histórico)
 START_DATE = datetime(2015, 1, 1)
 
+# Quantas janelas mensais buscar em paralelo
+JANELAS_PARALELAS = int(os.getenv("BACKFILL_WORKERS", "4"))
+
+# Erros de leitura de um arquivo comprimido cortado ou corrompido
+ERROS_COMPRESSAO = (EOFError, OSError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
 # ---------------- FUNÇÕES AUXILIARES ----------------
-def save_json_incremental(path, new_data):
-    """Salva novos dados no arquivo JSON sem duplicar registros."""
+def _linhas_validas(path, danos: dict):
+    """
+    Linhas completas e legíveis do arquivo JSONL, com o pedido de cada uma.
+    Danos deixados por uma queda são registrados em 'danos':
+    - "cauda": última linha sem quebra de linha (queda no meio de um acréscimo; essa
+      janela ainda não tinha entrado no checkpoint);
+    - "meio": linha ilegível antes do fim (ex.: acréscimo colado numa linha cortada,
+      cujos pedidos podem pertencer a janelas já marcadas como concluídas);
+    - "comprimido": bloco gzip/zstd cortado ou corrompido. A leitura para nele, então
+      os blocos acrescentados depois (de janelas concluídas) também ficam ilegíveis.
+    """
+    try:
+        with open_text(path) as f:
+            for linha in f:
+                if not linha.endswith("\n"):
+                    danos["cauda"] = True
+                    return
+                if not linha.strip():
+                    continue
+                try:
+                    pedido = json.loads(linha)
+                except json.JSONDecodeError:
+                    danos["meio"] = True
+                    continue
+                yield linha, pedido
+    except ERROS_COMPRESSAO:
+        danos["comprimido"] = True
+
+
+def load_existing_ids(path, danos: dict = None):
+    """
+    Carrega os IDs já gravados no arquivo JSONL (uma única leitura por execução).
+    Só conta linhas completas e legíveis; os danos encontrados vão para 'danos'.
+    """
+    ids = set()
     if path.exists():
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                existing = json.load(f)
-        except Exception:
-            existing = []
-    else:
-        existing = []
+        for _, pedido in _linhas_validas(path, danos if danos is not None else {}):
+            ids.add(str(pedido.get("id")))
+    return ids
 
-    # Criar um conjunto com IDs já existentes
-    existing_ids = {str(e.get("id")) for e in existing}
-    filtered_new = [n for n in new_data if str(n.get("id")) not in existing_ids]
 
-    # Se houver dados novos, adiciona e salva
+def reparar_jsonl(path):
+    """
+    Regrava o arquivo só com as linhas válidas (temporário + substituição), para o
+    próximo acréscimo não ser colado numa linha cortada nem depois de um bloco
+    comprimido corrompido (que esconderia tudo o que viesse depois dele).
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open_text(tmp, "w") as f:
+        for linha, _ in _linhas_validas(path, {}):
+            f.write(linha)
+    with open(tmp, "rb+") as bruto:
+        os.fsync(bruto.fileno())
+    os.replace(tmp, path)
+
+
+def append_jsonl(path, new_data, existing_ids):
+    """
+    Acrescenta ao arquivo JSONL apenas os pedidos ainda não gravados (sem reescrever o arquivo).
+    Em arquivos comprimidos cada acréscimo vira um novo bloco gzip/zstd. Uma queda no
+    meio do acréscimo deixa o arquivo danificado; fetch_orders_in_batches o repara
+    (reparar_jsonl) antes do próximo acréscimo.
+    """
+    filtered_new = [n for n in new_data if str(n.get("id")) not in existing_ids]
     if filtered_new:
-        existing.extend(filtered_new)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
-        print(f"  ➕ {len(filtered_new)} novos pedidos adicionados. Total: {len(existing)}")
+        with open_text(path, "a") as f:
+            for pedido in filtered_new:
+                f.write(json.dumps(pedido, ensure_ascii=False) + "\n")
+        with open(path, "rb+") as bruto:
+            os.fsync(bruto.fileno())
+        existing_ids.update(str(n.get("id")) for n in filtered_new)
+        print(f"  ➕ {len(filtered_new)} novos pedidos adicionados. Total: {len(existing_ids)}")
     else:
         print("  Nenhum pedido novo encontrado.")
 
-def fetch_orders_in_batches(loja, seller_id, output_path):
-    """Busca pedidos de uma loja mês a mês e salva no arquivo."""
-    today = datetime.utcnow()
-    current = START_DATE
 
-    print(f"\n--- Iniciando busca completa para {loja} ---")
-    print(f"Período: {START_DATE.date()} → {today.date()}")
-    print(f"Arquivo destino: {output_path}")
+def importar_legado(output_path, existing_ids):
+    """
+    Importa uma única vez o backfill em JSON (lista) das versões anteriores,
+    {loja}_orders.json, e o renomeia para .json.importado.
+    """
+    legado = output_path.with_name(f"{output_path.name.split('.')[0]}.json")
+    if not legado.exists():
+        return
+    try:
+        with open(legado, "r", encoding="utf-8") as f:
+            pedidos = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"  ⚠️ Não foi possível importar {legado.name}: {e}")
+        return
+    print(f"  📥 Importando {len(pedidos)} pedidos de {legado.name}")
+    append_jsonl(output_path, pedidos, existing_ids)
+    os.replace(legado, legado.with_name(legado.name + ".importado"))
+
+
+def load_checkpoint(path):
+    """Retorna o conjunto de janelas (início do mês, ISO) já concluídas."""
+    if not path.exists():
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return set(json.load(f).get("janelas_concluidas", []))
 
-    while current < today:
+
+def save_checkpoint(path, concluidas):
+    write_json_atomic(path, {
+        "janelas_concluidas": sorted(concluidas),
+        "atualizado_em": datetime.utcnow().isoformat(),
+    })
+
+
+def month_windows(start, end):
+    """Lista as janelas mensais (início, fim) entre start e end."""
+    janelas = []
+    current = start
+    while current < end:
         month_start = current
         month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
-        if month_end > today:
-            month_end = today
+        if month_end > end:
+            month_end = end
+        janelas.append((month_start, month_end))
+        if month_end >= end:
+            break
+        current = (month_end + timedelta(seconds=1)).replace(hour=0, minute=0, second=0)
+    return janelas
+
+
+def fetch_orders_in_batches(loja, seller_id, output_path, workers=JANELAS_PARALELAS, reset=False):
+    """
+    Busca pedidos de uma loja mês a mês e acrescenta no arquivo JSONL.
+    Cada mês concluído é registrado no checkpoint, então uma execução interrompida
+    retoma de onde parou. Várias janelas são buscadas em paralelo.
+    """
+    today = datetime.utcnow()
+    checkpoint_path = output_path.with_name(f"{output_path.name.split('.')[0]}.checkpoint.json")
+    if reset:
+        checkpoint_path.unlink(missing_ok=True)
+
+    danos = {}
+    existing_ids = load_existing_ids(output_path, danos)
+    if danos:
+        print(f"⚠️ {output_path.name} danificado por uma execução interrompida; regravando as linhas válidas.")
+        reparar_jsonl(output_path)
+        if danos.get("meio") or danos.get("comprimido"):
+            # Pedidos perdidos podem ser de janelas já concluídas: busca todas de novo
+            # (os já gravados são ignorados pelo id)
+            print("⚠️ Checkpoint descartado: todas as janelas serão buscadas novamente.")
+            checkpoint_path.unlink(missing_ok=True)
+    importar_legado(output_path, existing_ids)
 
-        print(f"\n[{loja}] Buscando período: {month_start.date()} → {month_end.date()}")
+    concluidas = load_checkpoint(checkpoint_path)
+    pendentes = [j for j in month_windows(START_DATE, today) if j[0].isoformat() not in concluidas]
 
-        try:
-            batch = fetch_orders_incremental(
+    print(f"\n--- Iniciando busca completa para {loja} ---")
+    print(f"Período: {START_DATE.date()} → {today.date()}")
+    print(f"Arquivo destino: {output_path}")
+    print(f"Janelas concluídas: {len(concluidas)} | pendentes: {len(pendentes)} | workers: {workers}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            pool.submit(
+                fetch_orders_incremental,
                 loja,
                 seller_id,
                 start_date=month_start.isoformat(),
                 end_date=month_end.isoformat()
-            )
+            ): (month_start, month_end)
+            for month_start, month_end in pendentes
+        }
+        for futuro in as_completed(futuros):
+            month_start, month_end = futuros[futuro]
+            print(f"\n[{loja}] Período: {month_start.date()} → {month_end.date()}")
+            try:
+                batch = futuro.result()
+            except Exception as e:
+                print(f"  ⚠️ Erro ao buscar período {month_start.date()} → {month_end.date()}: {e}")
+                continue
+
             print(f"  {len(batch)} pedidos encontrados.")
-            save_json_incremental(output_path, batch)
-        except Exception as e:
-            print(f"  ⚠️ Erro ao buscar período {month_start.date()} → {month_end.date()}: {e}")
+            append_jsonl(output_path, batch, existing_ids)
+            # O mês corrente ainda recebe pedidos: não entra no checkpoint
+            if month_end < today:
+                concluidas.add(month_start.isoformat())
+                save_checkpoint(checkpoint_path, concluidas)
 
-        current = (month_end + timedelta(seconds=1)).replace(hour=0, minute=0, second=0)
+def backfill_path(loja):
+    """
+    Arquivo do backfill da loja, comprimido conforme ORDER_STORE_COMPRESSION.
+    Um arquivo sem compressão de execuções anteriores continua sendo usado.
+    """
+    legado = OUTPUT_DIR / f"{loja}_orders.jsonl"
+    if legado.exists():
+        return legado
+    return OUTPUT_DIR / f"{loja}_orders.jsonl{EXTENSOES[COMPRESSION]}"
 
 # ---------------- EXECUÇÃO PRINCIPAL ----------------
 def main():
+    reset = "--reset" in sys.argv
     for loja in LOJAS:
         cfg = load_config(loja)
-        output_file = OUTPUT_DIR / f"{loja}_orders.json"
+        output_file = backfill_path(loja)
+        fetch_orders_in_batches(loja, int(cfg["seller_id"]), output_file, reset=reset)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 
 import os
 import sys
-import json
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
@@ -26,7 +25,9 @@ BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 if BASE_PATH not in sys.path:
     sys.path.insert(0, BASE_PATH)
 
-from ml_client import load_config, save_orders_incremental
+from ml_client import load_config
+from ml_scheduler import executar_jobs
+from order_store import OrderStore
 
 # ---------------- FUNÇÕES AUXILIARES ----------------
 def to_utc_z(dt_str):
@@ -38,18 +39,14 @@ def to_utc_z(dt_str):
         return dt_str
 
 def get_last_date(json_path):
-    """Retorna a última data encontrada no arquivo JSON em UTC."""
+    """
+    Retorna a última data de venda da loja em UTC.
+    Lida em O(1) dos metadados do store de pedidos (marca d'água gravada a cada commit).
+    """
     try:
-        if not os.path.exists(json_path):
-            return None
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if not data:
-            return None
-        dates = [d.get("date_created") for d in data if "date_created" in d]
-        if not dates:
+        last_date = OrderStore(json_path).high_water_mark()
+        if not last_date:
             return None
-        last_date = max(dates)
         return to_utc_z(last_date)
     except Exception as e:
         print(f"[WARN] Erro ao obter última data de {json_path}: {e}")
@@ -58,9 +55,13 @@ def get_last_date(json_path):
 # ---------------- ATUALIZAÇÃO INCREMENTAL ----------------
 def update_once():
     """
-    Atualiza apenas as vendas NOVAS para MG e SP,
-    usando como referência a última data no backup.
+    Atualiza as vendas novas e as alteradas (cancelamentos, devoluções) para MG e SP,
+    a partir da marca d'água de last_updated de cada loja. Na primeira execução
+    usa como referência a última data no backup.
+    As lojas são sincronizadas em paralelo pelo motor assíncrono (ml_sync);
+    uma loja que já está sincronizando em outro processo (daemon) é pulada.
     """
+    jobs = []
     for loja in ["MG", "SP"]:
         cfg = load_config(loja)
         json_path = cfg["json_path"]
@@ -77,22 +78,28 @@ def update_once():
 
         end_date = to_utc_z(datetime.now(timezone.utc))
 
-        # Faz a busca incremental
-        try:
-            novos = save_orders_incremental(
-                loja,
-                int(cfg["seller_id"]),
-                cfg["json_path"],
-                start_date=start_date,
-                end_date=end_date
-            )
-            if novos:
-                print(f"[INFO] {novos} novos pedidos adicionados para {loja}.")
-            else:
-                print(f"[INFO] Nenhum novo pedido para {loja}.")
-        except Exception as e:
-            print(f"[ERROR] Falha ao atualizar {loja}: {e}")
-            sys.exit(1)
+        jobs.append({
+            "store": loja,
+            "seller_id": int(cfg["seller_id"]),
+            "path": json_path,
+            "start_date": start_date,
+            "end_date": end_date,
+            "mode": "last_updated",
+        })
+
+    # Faz a busca incremental
+    falhou = False
+    for loja, novos in executar_jobs(jobs, origem="manual").items():
+        if isinstance(novos, Exception):
+            print(f"[ERROR] Falha ao atualizar {loja}: {novos}")
+            falhou = True
+        elif novos:
+            print(f"[INFO] {novos} pedidos novos/atualizados para {loja}.")
+        else:
+            print(f"[INFO] Nenhum novo pedido para {loja}.")
+
+    if falhou:
+        sys.exit(1)
 
 if __name__ == "__main__":
     update_once()
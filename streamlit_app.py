@@ -5,7 +5,7 @@ import pandas as pd
 from datetime import date
 from pathlib import Path
 from dotenv import load_dotenv
-from utils.utils_filtros import filtrar_vendas_json_por_periodo
+from utils.utils_filtros import filtrar_cubo_por_periodo, contar_pedidos_por_periodo
 
 # ---------------- CONFIGURAÇÕES ----------------
 BASE_PATH = Path(__file__).resolve().parent
@@ -46,15 +46,16 @@ start_date = st.sidebar.date_input("Data inicial", value=today, key="start_date"
 end_date = st.sidebar.date_input("Data final", value=today, key="end_date")
 
 # ---------------- FILTRAR VENDAS ----------------
-df_sp_periodo = filtrar_vendas_json_por_periodo(str(JSON_SP), start_date, end_date, unidade="SP")
-df_mg_periodo = filtrar_vendas_json_por_periodo(str(JSON_MG), start_date, end_date, unidade="MG")
+df_sp_periodo = filtrar_cubo_por_periodo(str(JSON_SP), start_date, end_date, unidade="SP")
+df_mg_periodo = filtrar_cubo_por_periodo(str(JSON_MG), start_date, end_date, unidade="MG")
 
 # ---------------- CARDS ----------------
 fat_sp = df_sp_periodo.get("Valor total", pd.Series(dtype=float)).sum()
 fat_mg = df_mg_periodo.get("Valor total", pd.Series(dtype=float)).sum()
 fat_total = fat_sp + fat_mg
 qt_itens = int(df_sp_periodo.get("Quantidade", pd.Series(dtype=float)).sum() + df_mg_periodo.get("Quantidade", pd.Series(dtype=float)).sum())
-qt_pedidos = len(df_sp_periodo) + len(df_mg_periodo)
+qt_pedidos = (contar_pedidos_por_periodo(str(JSON_SP), start_date, end_date, unidade="SP")
+              + contar_pedidos_por_periodo(str(JSON_MG), start_date, end_date, unidade="MG"))
 
 st.markdown(f"## Resumo de {start_date.strftime('%d/%m/%Y')} até {end_date.strftime('%d/%m/%Y')}")
 col1, col2, col3, col4 = st.columns(4)
@@ -69,7 +70,7 @@ st.subheader(f"Vendas São Paulo (SP) — {start_date.strftime('%d/%m/%Y')} →
 if df_sp_periodo.empty:
     st.info("Nenhuma venda encontrada em SP no período selecionado.")
 else:
-    df_sp_resumo = df_sp_periodo.groupby("Produto", as_index=False).agg({"Quantidade": "sum", "Valor total": "sum"})
+    df_sp_resumo = df_sp_periodo.groupby("Produto", as_index=False, observed=True).agg({"Quantidade": "sum", "Valor total": "sum"})
     df_sp_resumo = df_sp_resumo.sort_values("Valor total", ascending=False)
     st.dataframe(df_sp_resumo, use_container_width=True)
 
@@ -78,6 +79,6 @@ st.subheader(f"Vendas Minas Gerais (MG) — {start_date.strftime('%d/%m/%Y')} 
 if df_mg_periodo.empty:
     st.info("Nenhuma venda encontrada em MG no período selecionado.")
 else:
-    df_mg_resumo = df_mg_periodo.groupby("Produto", as_index=False).agg({"Quantidade": "sum", "Valor total": "sum"})
+    df_mg_resumo = df_mg_periodo.groupby("Produto", as_index=False, observed=True).agg({"Quantidade": "sum", "Valor total": "sum"})
     df_mg_resumo = df_mg_resumo.sort_values("Valor total", ascending=False)
     st.dataframe(df_mg_resumo, use_container_width=True)
@@ -1,11 +1,9 @@
-import requests
 from ml_client import get_valid_token
+from ml_http import get_client
 
 def listar_product_ads(store: str):
     token = get_valid_token(store)
-    url = "https://api.mercadolibre.com/product_ads/campaigns"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
+    resp = get_client().get("/product_ads/campaigns", token=token)
     print(f"{store} - Status Code:", resp.status_code)
     print(resp.json())
 
@@ -0,0 +1,91 @@
+"""
+Busca de pedidos com mais de OFFSET_MAX pedidos numa única janela, contra o mock
+local da API (scripts/mock_ml_api.py), que responde 400 acima do teto de offset.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+MOCK_SCRIPT = BASE_PATH / "scripts" / "mock_ml_api.py"
+SELLER_ID = 111
+N_PEDIDOS = 15000  # bem acima do teto de 10000 mesmo só com os pagos
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    porta = _porta_livre()
+    api_base = f"http://127.0.0.1:{porta}"
+    proc = subprocess.Popen([sys.executable, str(MOCK_SCRIPT), "--pedidos", str(N_PEDIDOS), "--porta", str(porta)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{api_base}/_mock/stats", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        else:
+            pytest.fail(f"Mock da API não respondeu em {api_base}")
+
+        # ml_http lê ML_API_BASE e ml_client cria tokens/ no diretório atual ao importar
+        workdir = tmp_path_factory.mktemp("offset_max")
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        os.environ["ML_API_BASE"] = api_base
+        os.environ["SP_JSON_PATH"] = str(workdir / "backup_vendas_sp.json")
+        os.environ["SP_TOKEN_JSON"] = json.dumps({
+            "access_token": "x", "refresh_token": "y", "expires_in": 0, "_obtained_at": 0,
+        })
+        sys.path.insert(0, str(BASE_PATH))
+        for modulo in ("ml_http", "ml_client"):
+            sys.modules.pop(modulo, None)
+        import ml_client
+
+        total = httpx.get(f"{api_base}/orders/search",
+                          params={"seller": SELLER_ID, "status": "paid", "limit": 1}).json()["paging"]["total"]
+        assert total > ml_client.OFFSET_MAX
+        yield ml_client, total
+    finally:
+        proc.kill()
+        proc.wait()
+        if "cwd" in locals():
+            os.chdir(cwd)
+
+
+def _checar(pedidos: list, total: int):
+    ids = [p["id"] for p in pedidos]
+    assert len(ids) == total
+    assert len(set(ids)) == total
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_fetch_all_orders_acima_do_teto(api, workers):
+    ml_client, total = api
+    pedidos = ml_client.fetch_all_orders("SP", SELLER_ID, workers=workers)
+    _checar(pedidos, total)
+    datas = [ml_client._parse_iso(p["date_created"]) for p in pedidos]
+    assert datas == sorted(datas)
+
+
+def test_fetch_orders_incremental_divide_a_janela(api):
+    ml_client, total = api
+    fim = datetime.now(timezone.utc)
+    inicio = fim - timedelta(days=4 * 365)
+    pedidos = ml_client.fetch_orders_incremental("SP", SELLER_ID, inicio.isoformat(timespec="milliseconds"),
+                                                 fim.isoformat(timespec="milliseconds"))
+    _checar(pedidos, total)
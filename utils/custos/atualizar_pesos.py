@@ -1,4 +1,4 @@
-from utils.utils_filtros import filtrar_vendas_json_por_periodo
+from utils.utils_filtros import filtrar_cubo_por_periodo
 import pandas as pd
 from pathlib import Path
 
@@ -7,7 +7,7 @@ CAMINHO_VENDAS_SP = Path(r"C:/Users/dmdel/OneDrive/Aplicativos/tokens/vendas/bac
 CAMINHO_VENDAS_MG = Path(r"C:/Users/dmdel/OneDrive/Aplicativos/tokens/vendas/backup_vendas_mg_pp.json")
 
 def calcular_pesos_por_estado(caminho_json, data_inicio, data_fim, unidade) -> tuple[dict, float]:
-    df = filtrar_vendas_json_por_periodo(
+    df = filtrar_cubo_por_periodo(
         caminho_json=str(caminho_json),
         data_inicio=data_inicio,
         data_fim=data_fim,
@@ -17,7 +17,7 @@ def calcular_pesos_por_estado(caminho_json, data_inicio, data_fim, unidade) -> t
     if df.empty:
         return {}, 0.0
 
-    vendas_por_sku = df.groupby("SKU")["Valor total"].sum()
+    vendas_por_sku = df.groupby("SKU", observed=True)["Valor total"].sum()
     total_vendas = vendas_por_sku.sum()
     pesos = (vendas_por_sku / total_vendas).to_dict()
 
@@ -3,6 +3,7 @@ import os
 import unicodedata
 from datetime import datetime, date
 from rapidfuzz import process, fuzz
+from order_store import iter_orders
 
 # Configuração de paths
 BASE_PATH = os.getenv("BASE_PATH", r"C:/Users/dmdel/OneDrive/Aplicativos")
@@ -64,10 +65,7 @@ def process_city(city_name, sales_json_path):
     date_open, date_close = periods[city_name]
     # Monta sales_map
     sales_map = {}
-    with open(sales_json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    orders = data if isinstance(data, list) else data.get('orders', [])
-    for order in orders:
+    for order in iter_orders(sales_json_path):
         try:
             dt = datetime.fromisoformat(order.get('date_created').replace('Z', '+00:00')).date()
         except:
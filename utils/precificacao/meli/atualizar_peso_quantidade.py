@@ -1,10 +1,9 @@
-import pandas as pd
 from pathlib import Path
 from utils.precificacao.meli.precificacao_io import carregar_dados, salvar_dados
-from utils.utils_filtros import filtrar_vendas_json_por_periodo, quantidade_vendida_por_sku
+from utils.utils_filtros import filtrar_cubo_por_periodo, quantidade_vendida_por_sku
 
 def calcular_peso_quantidade(caminho_vendas: Path, data_inicio, data_fim, cd_nome: str, coluna_destino: str):
-    df_vendas = filtrar_vendas_json_por_periodo(str(caminho_vendas), data_inicio, data_fim)
+    df_vendas = filtrar_cubo_por_periodo(str(caminho_vendas), data_inicio, data_fim)
     df_qtd = quantidade_vendida_por_sku(df_vendas)
 
     qtd_total = df_qtd["Qtd Vendida"].sum()
@@ -1,44 +1,87 @@
 import pandas as pd
-import json
-from datetime import date, datetime
+from utils.vendas_cache import carregar_vendas, ler_vendas_periodo, carregar_cubo, carregar_pedidos_dia
+
+def _fatiar_periodo(df: pd.DataFrame, data_inicio, data_fim, unidade: str = None, colunas: list = None) -> pd.DataFrame:
+    """
+    Cópia das linhas do período (e da unidade) de uma tabela ordenada por data:
+    o período é um bloco contíguo, localizado por busca binária.
+    Custo por consulta: O(log n) para achar o período + O(k) para copiar as linhas.
+    """
+    if "Data da venda" not in df.columns:
+        return pd.DataFrame()
+
+    datas = df["Data da venda"]
+    inicio = datas.searchsorted(pd.Timestamp(data_inicio).normalize(), side="left")
+    fim = datas.searchsorted(pd.Timestamp(data_fim).normalize() + pd.Timedelta(days=1), side="left")
+    df = df.iloc[inicio:fim]
+
+    if unidade and "Unidade" in df.columns:
+        df = df[df["Unidade"] == unidade]
+
+    if colunas is not None:
+        return df[[c for c in colunas if c in df.columns]].copy()
+    return df.copy()
+
 
 def filtrar_vendas_json_por_periodo(
     caminho_json: str,
     data_inicio,
     data_fim,
-    unidade: str = None
+    unidade: str = None,
+    colunas: list = None
 ) -> pd.DataFrame:
-    try:
-        with open(caminho_json, "r", encoding="utf-8") as f:
-            vendas = json.load(f)
-        df = pd.DataFrame(vendas)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return pd.DataFrame()
+    """
+    Vendas do período (e da unidade, se informada) a partir do arquivo pré-processado.
+    O arquivo é lido uma vez por processo (utils.vendas_cache) e relido só quando
+    muda; cada chamada devolve uma cópia com as linhas e colunas pedidas.
+    Enquanto o arquivo não está no cache, períodos curtos leem só as partições do mês.
+    """
+    vendas = ler_vendas_periodo(caminho_json, data_inicio, data_fim, unidade)
+    if vendas is None:
+        vendas = carregar_vendas(caminho_json)
+    return _fatiar_periodo(vendas, data_inicio, data_fim, unidade, colunas)
 
-    if df.empty or "Data da venda" not in df.columns:
-        return pd.DataFrame()
 
-    # Converte mesmo se já estiver formatado
-    df["Data da venda"] = pd.to_datetime(df["Data da venda"], errors="coerce")
-    df = df.dropna(subset=["Data da venda"])
+def filtrar_cubo_por_periodo(
+    caminho_json: str,
+    data_inicio,
+    data_fim,
+    unidade: str = None,
+    colunas: list = None
+) -> pd.DataFrame:
+    """
+    Como filtrar_vendas_json_por_periodo, mas a partir do cubo diário: uma linha por
+    dia, Unidade, SKU, anúncio e produto, com Quantidade, Valor total e Pedidos.
+    Para somas e rankings; o custo depende dos dias do período, não do histórico.
+    Pedidos é por célula: para o total do período use contar_pedidos_por_periodo.
+    """
+    return _fatiar_periodo(carregar_cubo(caminho_json), data_inicio, data_fim, unidade, colunas)
 
-    # Aplica filtro por intervalo de data
-    df_filtrado = df[
-        (df["Data da venda"].dt.date >= data_inicio) &
-        (df["Data da venda"].dt.date <= data_fim)
-    ].copy()
 
-    if unidade and "Unidade" in df_filtrado.columns:
-        df_filtrado = df_filtrado[df_filtrado["Unidade"] == unidade]
+def contar_pedidos_por_periodo(caminho_json: str, data_inicio, data_fim, unidade: str = None) -> int:
+    """
+    Pedidos distintos do período (e da unidade). Use no lugar de somar a coluna
+    Pedidos do cubo, que conta o mesmo pedido em cada SKU/anúncio dele.
+    """
+    df = _fatiar_periodo(carregar_pedidos_dia(caminho_json), data_inicio, data_fim, unidade, ["Pedidos"])
+    return int(df["Pedidos"].sum()) if not df.empty else 0
 
-    # Conversões de segurança
-    df_filtrado["Valor total"] = pd.to_numeric(df_filtrado.get("Valor total", 0.0), errors="coerce").fillna(0.0)
-    df_filtrado["Quantidade"] = pd.to_numeric(df_filtrado.get("Quantidade", 0), errors="coerce").fillna(0).astype(int)
-    df_filtrado["codigo_do_anuncio"] = df_filtrado.get("codigo_do_anuncio", "")
-    df_filtrado["Produto"] = df_filtrado.get("Produto", "")
-    df_filtrado["SKU"] = df_filtrado.get("SKU", "").astype(str)
 
-    return df_filtrado
+def concatenar_vendas(frames: list) -> pd.DataFrame:
+    """
+    Junta DataFrames de vendas (ex.: SP e MG) mantendo as colunas category:
+    as categorias são unificadas antes, senão o pandas converte para texto (object).
+    """
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    frames = [df.copy() for df in frames]
+    for coluna in frames[0].columns:
+        if all(coluna in df.columns and isinstance(df[coluna].dtype, pd.CategoricalDtype) for df in frames):
+            categorias = pd.api.types.union_categoricals([df[coluna] for df in frames]).categories
+            for df in frames:
+                df[coluna] = df[coluna].cat.set_categories(categorias)
+    return pd.concat(frames, ignore_index=True)
 
 
 def quantidade_vendida_por_sku(df_vendas: pd.DataFrame) -> pd.DataFrame:
@@ -49,7 +92,7 @@ def quantidade_vendida_por_sku(df_vendas: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame()
 
     return (
-        df_vendas.groupby("SKU")["Quantidade"]
+        df_vendas.groupby("SKU", observed=True)["Quantidade"]
         .sum()
         .reset_index()
         .rename(columns={"Quantidade": "Qtd Vendida"})
@@ -64,7 +107,7 @@ def quantidade_vendida_por_sku(df_vendas: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame()
 
     return (
-        df_vendas.groupby("SKU")["Quantidade"]
+        df_vendas.groupby("SKU", observed=True)["Quantidade"]
         .sum()
         .reset_index()
         .rename(columns={"Quantidade": "Qtd Vendida"})
@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from utils.vendas_dataset import (
+    dataset_path_for, ler_tudo, ler_periodo, cubo_path_for, ler_cubo, agregar_cubo,
+    pedidos_dia_path_for, ler_pedidos_dia, agregar_pedidos_dia,
+)
+
+# Cache em memória do processo (compartilhado entre as sessões do Streamlit):
+# (tipo, caminho do JSON) -> (assinatura dos arquivos, DataFrame)
+_vendas_cache = {}
+_vendas_locks = {}
+_vendas_locks_guard = threading.Lock()
+
+# Períodos de até tantos dias são lidos direto das partições do mês enquanto o
+# cache do arquivo não está carregado (ex.: scripts que consultam só os últimos 30 dias)
+JANELA_LEITURA_DIRETA_DIAS = int(os.getenv("VENDAS_JANELA_DIRETA_DIAS", "62"))
+
+# Textos muito repetidos: guardados como category (dicionário + códigos inteiros)
+COLUNAS_CATEGORICAS = ["Produto", "SKU", "Unidade", "codigo_do_anuncio"]
+
+
+def _vendas_lock(chave: tuple) -> threading.Lock:
+    with _vendas_locks_guard:
+        return _vendas_locks.setdefault(chave, threading.Lock())
+
+
+def _stat(caminho: Path):
+    try:
+        st = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _assinatura(caminho: Path):
+    """
+    (mtime, tamanho) do estado do preprocess e do JSON legado. O estado é gravado
+    depois do dataset Parquet e do cubo, então uma leitura feita no meio de um
+    preprocess é invalidada quando ele termina. None se nenhum dos dois existe.
+    """
+    estado = _stat(caminho.with_suffix(".state.json"))
+    legado = _stat(caminho)
+    if estado is None and legado is None:
+        return None
+    return (estado, legado)
+
+
+def _carregar(caminho: Path) -> pd.DataFrame:
+    """Lê as vendas (dataset Parquet ou, nas saídas antigas, o JSON) e normaliza os tipos."""
+    dataset_dir = dataset_path_for(caminho)
+    if dataset_dir.exists():
+        df = ler_tudo(dataset_dir)
+    else:
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                df = pd.DataFrame(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return pd.DataFrame()
+
+    return _normalizar(df)
+
+
+def _normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "Data da venda" not in df.columns:
+        return pd.DataFrame()
+
+    # Converte mesmo se já estiver formatado
+    df["Data da venda"] = pd.to_datetime(df["Data da venda"], errors="coerce")
+    df = df.dropna(subset=["Data da venda"])
+
+    # Conversões de segurança
+    df["Valor total"] = pd.to_numeric(df.get("Valor total", 0.0), errors="coerce").fillna(0.0)
+    df["Quantidade"] = pd.to_numeric(df.get("Quantidade", 0), errors="coerce").fillna(0).astype(int)
+    df["codigo_do_anuncio"] = df.get("codigo_do_anuncio", "")
+    df["Produto"] = df.get("Produto", "")
+    df["SKU"] = df.get("SKU", "").astype(str)
+
+    # Ordenado por data (estável: mantém a ordem do arquivo dentro do dia) para
+    # os filtros de período fatiarem por busca binária
+    return _compactar(df).sort_values("Data da venda", kind="stable").reset_index(drop=True)
+
+
+def _compactar(df: pd.DataFrame) -> pd.DataFrame:
+    # Tipos compactos: category nos textos e int32 nas contagens. "Valor total"
+    # continua float64 para as somas em reais não perderem centavos.
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("category")
+    for coluna in ("Quantidade", "Pedidos"):
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("int32")
+    return df
+
+
+def _carregar_cubo(caminho: Path) -> pd.DataFrame:
+    """
+    Lê o cubo diário gravado pelo preprocess. Sem o arquivo (preprocess antigo),
+    agrega as linhas de vendas; nesse caso Pedidos conta linhas.
+    """
+    cubo_path = cubo_path_for(caminho)
+    if cubo_path.exists():
+        cubo = ler_cubo(cubo_path)
+    else:
+        vendas = carregar_vendas(caminho)
+        if vendas.empty:
+            return pd.DataFrame()
+        cubo = agregar_cubo(vendas)
+    if cubo.empty:
+        return pd.DataFrame()
+    cubo["Data da venda"] = pd.to_datetime(cubo["Data da venda"])
+    # Já vem ordenado pela chave, que começa pela data
+    return _compactar(cubo).sort_values("Data da venda", kind="stable").reset_index(drop=True)
+
+
+def _carregar_pedidos_dia(caminho: Path) -> pd.DataFrame:
+    """
+    Lê os pedidos distintos por dia gravados pelo preprocess. Sem o arquivo
+    (preprocess antigo), conta as linhas de vendas de cada dia.
+    """
+    pedidos_path = pedidos_dia_path_for(caminho)
+    if pedidos_path.exists():
+        totais = ler_pedidos_dia(pedidos_path)
+    else:
+        vendas = carregar_vendas(caminho)
+        if vendas.empty:
+            return pd.DataFrame()
+        totais = agregar_pedidos_dia(vendas)
+    if totais.empty:
+        return pd.DataFrame()
+    totais["Data da venda"] = pd.to_datetime(totais["Data da venda"])
+    return _compactar(totais).sort_values("Data da venda", kind="stable").reset_index(drop=True)
+
+
+def _em_cache(tipo: str, caminho_json, carregar) -> pd.DataFrame:
+    caminho = Path(caminho_json).resolve()
+    chave = (tipo, str(caminho))
+    assinatura = _assinatura(caminho)
+    if assinatura is None:
+        _vendas_cache.pop(chave, None)
+        return carregar(caminho)
+
+    em_cache = _vendas_cache.get(chave)
+    if em_cache and em_cache[0] == assinatura:
+        return em_cache[1]
+
+    with _vendas_lock(chave):
+        # Outra sessão pode ter carregado enquanto esperávamos o lock
+        em_cache = _vendas_cache.get(chave)
+        if em_cache and em_cache[0] == assinatura:
+            return em_cache[1]
+        df = carregar(caminho)
+        _vendas_cache[chave] = (assinatura, df)
+        return df
+
+
+def carregar_vendas(caminho_json) -> pd.DataFrame:
+    """
+    Vendas do arquivo pré-processado, lidas uma única vez por processo.
+    A leitura é refeita a cada execução do preprocess (muda o arquivo de estado).
+    As linhas vêm ordenadas por "Data da venda" (datetime64); os textos são
+    category (agrupe com observed=True).
+    O DataFrame retornado é compartilhado: não altere; filtre ou use .copy().
+    """
+    return _em_cache("vendas", caminho_json, _carregar)
+
+
+def ler_vendas_periodo(caminho_json, data_inicio, data_fim, unidade: str = None):
+    """
+    Leitura a frio de um período curto: se as vendas do arquivo ainda não estão no
+    cache (ou ficaram velhas) e o período tem até JANELA_LEITURA_DIRETA_DIAS dias, lê só
+    as partições (Unidade, mês) do período, já com os tipos de carregar_vendas.
+    Retorna None quando vale mais usar carregar_vendas (cache válido, período longo
+    ou saída sem dataset Parquet). Nada é guardado no cache.
+    """
+    inicio, fim = pd.Timestamp(data_inicio).date(), pd.Timestamp(data_fim).date()
+    if (fim - inicio).days + 1 > JANELA_LEITURA_DIRETA_DIAS:
+        return None
+    caminho = Path(caminho_json).resolve()
+    dataset_dir = dataset_path_for(caminho)
+    assinatura = _assinatura(caminho)
+    em_cache = _vendas_cache.get(("vendas", str(caminho)))
+    if assinatura is None or not dataset_dir.exists() or (em_cache and em_cache[0] == assinatura):
+        return None
+    vendas = ler_periodo(dataset_dir, inicio, fim, unidade)
+    if vendas.empty:
+        # Período sem vendas: vazio, mas com as colunas e tipos da fatia do cache
+        vendas["Data da venda"] = pd.to_datetime(vendas["Data da venda"])
+        return _compactar(vendas)
+    return _normalizar(vendas)
+
+
+def carregar_cubo(caminho_json) -> pd.DataFrame:
+    """
+    Cubo diário do arquivo pré-processado (uma linha por dia, Unidade, SKU,
+    anúncio e produto, com Quantidade, Valor total e Pedidos), com o mesmo
+    cache, ordenação e tipos de carregar_vendas.
+    """
+    return _em_cache("cubo", caminho_json, _carregar_cubo)
+
+
+def carregar_pedidos_dia(caminho_json) -> pd.DataFrame:
+    """
+    Pedidos distintos por dia e Unidade do arquivo pré-processado, com o mesmo
+    cache, ordenação e tipos de carregar_vendas.
+    """
+    return _em_cache("pedidos_dia", caminho_json, _carregar_pedidos_dia)
@@ -0,0 +1,306 @@
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Colunas gravadas nos arquivos; Unidade e mes ficam no caminho (particionamento hive)
+COLUNAS_ARQUIVO = ["Data da venda", "Produto", "SKU", "Quantidade", "Valor total", "codigo_do_anuncio"]
+COLUNAS_VENDAS = COLUNAS_ARQUIVO + ["Unidade"]
+ARQUIVO_PARTICAO = "part-0.parquet"
+
+SCHEMA = pa.schema([
+    ("Data da venda", pa.date32()),
+    ("Produto", pa.string()),
+    ("SKU", pa.string()),
+    ("Quantidade", pa.int64()),
+    ("Valor total", pa.float64()),
+    ("codigo_do_anuncio", pa.string()),
+    # Pedido de origem da linha: usado pelo preprocess incremental para substituir
+    # as linhas de um pedido alterado; as leituras selecionam só COLUNAS_ARQUIVO
+    ("pedido_id", pa.string()),
+])
+
+
+# Cubo diário: vendas somadas por dia, unidade, SKU, anúncio e produto
+COLUNAS_CUBO_CHAVE = ["Data da venda", "Unidade", "SKU", "codigo_do_anuncio", "Produto"]
+COLUNAS_CUBO = COLUNAS_CUBO_CHAVE + ["Quantidade", "Valor total", "Pedidos"]
+
+SCHEMA_CUBO = pa.schema([
+    ("Data da venda", pa.date32()),
+    ("Unidade", pa.string()),
+    ("SKU", pa.string()),
+    ("codigo_do_anuncio", pa.string()),
+    ("Produto", pa.string()),
+    ("Quantidade", pa.int64()),
+    ("Valor total", pa.float64()),
+    ("Pedidos", pa.int64()),
+])
+
+# Pedidos distintos por dia e unidade. O total não sai da soma dos Pedidos das células
+# do cubo (um pedido com dois SKUs conta nas duas); como cada pedido tem um único dia,
+# estes totais somam corretamente em qualquer período.
+COLUNAS_PEDIDOS_DIA = ["Data da venda", "Unidade", "Pedidos"]
+
+SCHEMA_PEDIDOS_DIA = pa.schema([
+    ("Data da venda", pa.date32()),
+    ("Unidade", pa.string()),
+    ("Pedidos", pa.int64()),
+])
+
+
+def dataset_path_for(caminho_json) -> Path:
+    """
+    Dataset Parquet ao lado do JSON pré-processado:
+    backup_vendas_sp_pp.json -> backup_vendas_sp_pp_parquet/Unidade=SP/mes=2025-07/part-0.parquet
+    """
+    path = Path(caminho_json)
+    return path.with_name(f"{path.stem}_parquet")
+
+
+def cubo_path_for(caminho_json) -> Path:
+    """Cubo diário ao lado do JSON pré-processado: backup_vendas_sp_pp.json -> backup_vendas_sp_pp_cubo.parquet"""
+    path = Path(caminho_json)
+    return path.with_name(f"{path.stem}_cubo.parquet")
+
+
+def pedidos_dia_path_for(caminho_json) -> Path:
+    """Pedidos por dia ao lado do JSON pré-processado: backup_vendas_sp_pp.json -> backup_vendas_sp_pp_pedidos_dia.parquet"""
+    path = Path(caminho_json)
+    return path.with_name(f"{path.stem}_pedidos_dia.parquet")
+
+
+def _tabela(df: pd.DataFrame) -> pa.Table:
+    df = pd.DataFrame({
+        "Data da venda": pd.to_datetime(df["Data da venda"]).dt.date,
+        "Produto": df["Produto"].astype("string"),
+        "SKU": df["SKU"].astype("string"),
+        "Quantidade": pd.to_numeric(df["Quantidade"], errors="coerce").fillna(0).astype("int64"),
+        "Valor total": pd.to_numeric(df["Valor total"], errors="coerce").fillna(0.0).astype("float64"),
+        "codigo_do_anuncio": df["codigo_do_anuncio"].astype("string"),
+        "pedido_id": (df["pedido_id"].astype(str).astype("string") if "pedido_id" in df.columns
+                      else pd.Series(pd.NA, index=df.index, dtype="string")),
+    })
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def gravar_particoes(dataset_dir, registros: pd.DataFrame, unidade: str, meses=None):
+    """
+    Grava as vendas da unidade particionadas por mês.
+    - meses=None: reconstrói todas as partições da unidade.
+    - meses=[...]: regrava só esses meses (a partir de 'registros', que deve conter
+      todas as linhas da unidade nesses meses); meses sem linhas são removidos.
+    Cada partição é gravada em arquivo temporário e substituída de uma vez.
+    """
+    base = Path(dataset_dir) / f"Unidade={unidade}"
+    if meses is None:
+        if base.exists():
+            shutil.rmtree(base)
+        meses_alvo = None
+    else:
+        meses_alvo = set(meses)
+
+    if registros.empty:
+        por_mes = {}
+    else:
+        chave = registros["Data da venda"].astype(str).str[:7]
+        por_mes = {mes: grupo for mes, grupo in registros.groupby(chave, sort=True)}
+
+    for mes in sorted(meses_alvo if meses_alvo is not None else por_mes):
+        destino = base / f"mes={mes}" / ARQUIVO_PARTICAO
+        if mes not in por_mes:
+            if destino.parent.exists():
+                shutil.rmtree(destino.parent)
+            continue
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        tmp = destino.with_name(destino.name + ".tmp")
+        pq.write_table(_tabela(por_mes[mes]), tmp, compression="zstd")
+        os.replace(tmp, destino)
+
+
+def substituir_pedidos(dataset_dir, unidade: str, novos: pd.DataFrame, removidos: set, meses) -> tuple:
+    """
+    Atualiza só as partições dos meses informados: tira as linhas dos pedidos em
+    'removidos' e acrescenta 'novos' (linhas com pedido_id, todas nesses meses).
+    Retorna (linhas atuais desses meses, com Unidade e pedido_id; linhas removidas).
+    """
+    base = Path(dataset_dir) / f"Unidade={unidade}"
+    removidos = {str(pid) for pid in removidos}
+    partes, n_removidas = [], 0
+    for mes in sorted(meses):
+        arquivo = base / f"mes={mes}" / ARQUIVO_PARTICAO
+        if not arquivo.exists():
+            continue
+        anterior = pq.read_table(arquivo).to_pandas()
+        manter = ~anterior["pedido_id"].isin(removidos)
+        n_removidas += int((~manter).sum())
+        partes.append(anterior[manter])
+    if not novos.empty:
+        partes.append(novos.assign(pedido_id=novos["pedido_id"].astype(str)))
+
+    colunas = COLUNAS_ARQUIVO + ["pedido_id"]
+    atual = pd.concat([p[colunas] for p in partes], ignore_index=True) if partes else pd.DataFrame(columns=colunas)
+    atual["Data da venda"] = pd.to_datetime(atual["Data da venda"]).dt.strftime("%Y-%m-%d")
+    gravar_particoes(dataset_dir, atual, unidade, meses)
+    atual["Unidade"] = unidade
+    return atual, n_removidas
+
+
+def _meses_entre(inicio: date, fim: date) -> list:
+    meses = []
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        meses.append(f"{ano:04d}-{mes:02d}")
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return meses
+
+
+def _para_pandas(tabelas: list, colunas_arquivo: list, com_unidade: bool) -> pd.DataFrame:
+    if not tabelas:
+        tabela = SCHEMA.empty_table().select(colunas_arquivo)
+        if com_unidade:
+            tabela = tabela.append_column("Unidade", pa.array([], pa.string()))
+        tabelas = [tabela]
+    return _textos_como_str(pa.concat_tables(tabelas).to_pandas())
+
+
+def _textos_como_str(df: pd.DataFrame) -> pd.DataFrame:
+    # Mesmo tipo de texto que o pandas usa ao montar o DataFrame a partir do JSON
+    for coluna in df.columns:
+        if coluna != "Data da venda" and pd.api.types.is_string_dtype(df[coluna]):
+            df[coluna] = df[coluna].astype(str)
+    return df
+
+
+def _ler_particao(arquivo: Path, uf: str, colunas_arquivo: list, com_unidade: bool, filtro=None) -> pa.Table:
+    tabela = pq.read_table(arquivo, columns=colunas_arquivo, filters=filtro)
+    if com_unidade:
+        tabela = tabela.append_column("Unidade", pa.array([uf] * tabela.num_rows, pa.string()))
+    return tabela
+
+
+def ler_periodo(dataset_dir, data_inicio: date, data_fim: date, unidade: str = None,
+                colunas: list = None) -> pd.DataFrame:
+    """
+    Lê as vendas do período abrindo somente as partições (unidade, mês) do intervalo
+    e somente as colunas pedidas; o filtro por data é aplicado na leitura do Parquet.
+    """
+    dataset_dir = Path(dataset_dir)
+    unidades = [unidade] if unidade else sorted(
+        p.name.split("=", 1)[1] for p in dataset_dir.glob("Unidade=*")
+    )
+    colunas_arquivo = [c for c in (colunas or COLUNAS_ARQUIVO) if c in COLUNAS_ARQUIVO]
+    com_unidade = colunas is None or "Unidade" in colunas
+    filtro = [("Data da venda", ">=", data_inicio), ("Data da venda", "<=", data_fim)]
+
+    tabelas = []
+    for uf in unidades:
+        for mes in _meses_entre(data_inicio, data_fim):
+            arquivo = dataset_dir / f"Unidade={uf}" / f"mes={mes}" / ARQUIVO_PARTICAO
+            if arquivo.exists():
+                tabelas.append(_ler_particao(arquivo, uf, colunas_arquivo, com_unidade, filtro))
+    return _para_pandas(tabelas, colunas_arquivo, com_unidade)
+
+
+def ler_tudo(dataset_dir) -> pd.DataFrame:
+    """Lê todas as partições do dataset (todas as unidades e meses), em ordem de unidade e mês."""
+    dataset_dir = Path(dataset_dir)
+    tabelas = [
+        _ler_particao(arquivo, arquivo.parent.parent.name.split("=", 1)[1], COLUNAS_ARQUIVO, True)
+        for arquivo in sorted(dataset_dir.glob(f"Unidade=*/mes=*/{ARQUIVO_PARTICAO}"))
+    ]
+    return _para_pandas(tabelas, COLUNAS_ARQUIVO, True)
+
+
+# ---------------- CUBO DIÁRIO ----------------
+def agregar_cubo(registros: pd.DataFrame) -> pd.DataFrame:
+    """
+    Soma Quantidade e Valor total das linhas de venda por COLUNAS_CUBO_CHAVE.
+    Pedidos conta pedidos distintos da célula (coluna 'pedido_id'); sem ela, conta linhas.
+    """
+    if registros.empty:
+        return pd.DataFrame(columns=COLUNAS_CUBO)
+    df = registros.copy()
+    df["Data da venda"] = pd.to_datetime(df["Data da venda"]).dt.normalize()
+    df["Quantidade"] = pd.to_numeric(df["Quantidade"], errors="coerce").fillna(0).astype("int64")
+    df["Valor total"] = pd.to_numeric(df["Valor total"], errors="coerce").fillna(0.0).astype("float64")
+    for coluna in COLUNAS_CUBO_CHAVE[1:]:
+        df[coluna] = df[coluna].astype(str)
+    grupos = df.groupby(COLUNAS_CUBO_CHAVE, sort=True, observed=True)
+    cubo = grupos.agg(Quantidade=("Quantidade", "sum"), **{"Valor total": ("Valor total", "sum")})
+    cubo["Pedidos"] = grupos["pedido_id"].nunique() if "pedido_id" in df.columns else grupos.size()
+    return cubo.reset_index()[COLUNAS_CUBO]
+
+
+def _com_meses_anteriores(caminho: Path, df: pd.DataFrame, meses) -> pd.DataFrame:
+    """Junta a 'df' (só os meses informados) as linhas dos demais meses do arquivo existente."""
+    if meses is None or not caminho.exists():
+        return df
+    anterior = pq.read_table(caminho).to_pandas()
+    manter = ~anterior["Data da venda"].astype(str).str[:7].isin(set(meses))
+    return pd.concat([anterior[manter]] + ([df] if not df.empty else []), ignore_index=True)
+
+
+def _gravar_tabela(caminho: Path, df: pd.DataFrame, schema: pa.Schema):
+    tmp = caminho.with_name(caminho.name + ".tmp")
+    pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, caminho)
+
+
+def gravar_cubo(caminho, cubo: pd.DataFrame, meses=None):
+    """
+    Grava o cubo de uma unidade (arquivo temporário + substituição).
+    - meses=None: 'cubo' é o cubo completo.
+    - meses=[...]: 'cubo' traz só esses meses; as células dos demais meses são
+      mantidas do arquivo existente.
+    """
+    caminho = Path(caminho)
+    cubo = _com_meses_anteriores(caminho, cubo, meses)
+    cubo = pd.DataFrame({
+        "Data da venda": pd.to_datetime(cubo["Data da venda"]).dt.date,
+        **{coluna: cubo[coluna].astype("string") for coluna in COLUNAS_CUBO_CHAVE[1:]},
+        "Quantidade": cubo["Quantidade"].astype("int64"),
+        "Valor total": cubo["Valor total"].astype("float64"),
+        "Pedidos": cubo["Pedidos"].astype("int64"),
+    }).sort_values(COLUNAS_CUBO_CHAVE, kind="stable")
+    _gravar_tabela(caminho, cubo, SCHEMA_CUBO)
+
+
+def ler_cubo(caminho) -> pd.DataFrame:
+    """Lê o cubo completo (textos como str, como em ler_periodo)."""
+    return _textos_como_str(pq.read_table(caminho).to_pandas())
+
+
+def agregar_pedidos_dia(registros: pd.DataFrame) -> pd.DataFrame:
+    """Pedidos distintos (coluna 'pedido_id') por dia e unidade; sem ela, conta linhas."""
+    if registros.empty:
+        return pd.DataFrame(columns=COLUNAS_PEDIDOS_DIA)
+    df = pd.DataFrame({
+        "Data da venda": pd.to_datetime(registros["Data da venda"]).dt.normalize(),
+        "Unidade": registros["Unidade"].astype(str),
+    })
+    if "pedido_id" in registros.columns:
+        df["pedido_id"] = registros["pedido_id"].astype(str)
+    grupos = df.groupby(COLUNAS_PEDIDOS_DIA[:2], sort=True, observed=True)
+    pedidos = grupos["pedido_id"].nunique() if "pedido_id" in df.columns else grupos.size()
+    return pedidos.rename("Pedidos").reset_index()[COLUNAS_PEDIDOS_DIA]
+
+
+def gravar_pedidos_dia(caminho, totais: pd.DataFrame, meses=None):
+    """Grava os pedidos por dia de uma unidade; 'meses' como em gravar_cubo."""
+    caminho = Path(caminho)
+    totais = _com_meses_anteriores(caminho, totais, meses)
+    totais = pd.DataFrame({
+        "Data da venda": pd.to_datetime(totais["Data da venda"]).dt.date,
+        "Unidade": totais["Unidade"].astype("string"),
+        "Pedidos": totais["Pedidos"].astype("int64"),
+    }).sort_values(COLUNAS_PEDIDOS_DIA[:2], kind="stable")
+    _gravar_tabela(caminho, totais, SCHEMA_PEDIDOS_DIA)
+
+
+def ler_pedidos_dia(caminho) -> pd.DataFrame:
+    """Lê os pedidos por dia (textos como str, como em ler_cubo)."""
+    return _textos_como_str(pq.read_table(caminho).to_pandas())